@@ -0,0 +1,37 @@
+"""Compares encoding of large runs by the previous `jsonable_encoder` path and `ModelResponse`
+
+Run with `python benchmarks/serialization.py`
+"""
+
+import timeit
+
+from acp_sdk.models import Message, MessagePart, Run
+from acp_sdk.server.responses import ModelResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def create_run(messages: int, parts: int) -> Run:
+    return Run(
+        agent_name="benchmark",
+        output=[
+            Message(role="agent/benchmark", parts=[MessagePart(content="x" * 100) for _ in range(parts)])
+            for _ in range(messages)
+        ],
+    )
+
+
+def main() -> None:
+    for messages, parts in [(10, 10), (100, 10), (1000, 10)]:
+        run = create_run(messages, parts)
+        number = max(1, 1000 // messages)
+        encoder = timeit.timeit(lambda run=run: JSONResponse(jsonable_encoder(run)), number=number) / number
+        model = timeit.timeit(lambda run=run: ModelResponse(run), number=number) / number
+        print(
+            f"{messages * parts:>6} parts: jsonable_encoder {encoder * 1000:8.2f} ms, "
+            f"ModelResponse {model * 1000:8.2f} ms, {encoder / model:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
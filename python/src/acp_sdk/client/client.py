@@ -3,13 +3,18 @@ import logging
 import ssl
 import typing
 from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import timedelta
 from types import TracebackType
 from typing import Self
 
 import httpx
+from httpx._decoders import SUPPORTED_DECODERS
 from httpx_sse import EventSource, aconnect_sse
 from pydantic import TypeAdapter
+from websockets.asyncio.client import connect
 
+from acp_sdk.client.socket import RunSocket
 from acp_sdk.client.types import Input
 from acp_sdk.client.utils import input_to_messages
 from acp_sdk.instrumentation import get_tracer
@@ -24,8 +29,12 @@ from acp_sdk.models import (
     ErrorCode,
     ErrorEvent,
     Event,
+    EventMode,
     PingResponse,
     Run,
+    RunBatchCreateRequest,
+    RunBatchCreateResponse,
+    RunBatchEvent,
     RunCancelResponse,
     RunCreateRequest,
     RunCreateResponse,
@@ -34,6 +43,7 @@ from acp_sdk.models import (
     RunMode,
     RunResumeRequest,
     RunResumeResponse,
+    RunStatus,
     Session,
     SessionReadResponse,
 )
@@ -41,11 +51,25 @@ from acp_sdk.models import (
 logger = logging.getLogger(__name__)
 
 
+def accept_encoding(compression: bool) -> str:
+    """Advertises the encodings the installed httpx can decode, brotli and zstd need the `compression` extra"""
+    if not compression:
+        return "identity"
+    # httpx registers brotli and zstd decoders only when their packages are installed, zstd only since 0.27
+    return ", ".join(encoding for encoding in ("zstd", "br", "gzip") if encoding in SUPPORTED_DECODERS)
+
+
+# Set by the websocket handshake itself, or meaningless for it
+WEBSOCKET_HEADERS = {"host", "connection", "upgrade", "accept", "accept-encoding", "content-length", "user-agent"}
+
+
 class Client:
     def __init__(
         self,
         *,
         session: Session | None = None,
+        event_mode: EventMode = EventMode.FULL,
+        compression: bool = True,
         client: httpx.AsyncClient | None = None,
         manage_client: bool = True,
         auth: httpx._types.AuthTypes | None = None,
@@ -68,13 +92,19 @@ class Client:
         trust_env: bool = True,
     ) -> None:
         self._session = session
+        # Compact status events leave out the run output, consumers rebuild it with `EventExpander`
+        self._event_mode = event_mode
         self._session_last_refresh_base_url: httpx.URL | None = None
         self._session_refresh_lock = asyncio.Lock()
 
+        # Headers given by the caller take precedence over the advertised encodings
+        client_headers = httpx.Headers({"Accept-Encoding": accept_encoding(compression)})
+        client_headers.update(headers)
+
         self._client = client or httpx.AsyncClient(
             auth=auth,
             params=params,
-            headers=headers,
+            headers=client_headers,
             cookies=cookies,
             timeout=timeout,
             verify=verify,
@@ -92,6 +122,8 @@ class Client:
             trust_env=trust_env,
         )
         self._manage_client = manage_client
+        # Websockets are not served by the HTTP client, they repeat its TLS configuration when it was built here
+        self._ssl_options = None if client else {"verify": verify, "cert": cert, "trust_env": trust_env}
 
     @property
     def client(self) -> httpx.AsyncClient:
@@ -123,7 +155,9 @@ class Client:
             await self._client.__aexit__(exc_type, exc_value, traceback)
 
     def session(self, session: Session | None = None) -> Self:
-        return Client(client=self._client, manage_client=False, session=session or Session())
+        return Client(
+            client=self._client, manage_client=False, session=session or Session(), event_mode=self._event_mode
+        )
 
     async def agents(self, *, base_url: httpx.URL | str | None = None) -> AsyncIterator[Agent]:
         response = await self._client.get(self._create_url("/agents", base_url=base_url))
@@ -143,7 +177,14 @@ class Client:
         PingResponse.model_validate(response.json())
         return
 
-    async def run_sync(self, input: Input, *, agent: AgentName, base_url: httpx.URL | str | None = None) -> Run:
+    async def run_sync(
+        self,
+        input: Input,
+        *,
+        agent: AgentName,
+        idempotency_key: str | None = None,
+        base_url: httpx.URL | str | None = None,
+    ) -> Run:
         response = await self._client.post(
             self._create_url("/runs", base_url=base_url),
             content=RunCreateRequest(
@@ -152,12 +193,20 @@ class Client:
                 mode=RunMode.SYNC,
                 **(await self._prepare_session_for_run(base_url=base_url)),
             ).model_dump_json(),
+            headers=self._idempotency_headers(idempotency_key),
         )
         self._raise_error(response)
         response = RunCreateResponse.model_validate(response.json())
         return Run(**response.model_dump())
 
-    async def run_async(self, input: Input, *, agent: AgentName, base_url: httpx.URL | str | None = None) -> Run:
+    async def run_async(
+        self,
+        input: Input,
+        *,
+        agent: AgentName,
+        idempotency_key: str | None = None,
+        base_url: httpx.URL | str | None = None,
+    ) -> Run:
         response = await self._client.post(
             self._create_url("/runs", base_url=base_url),
             content=RunCreateRequest(
@@ -166,13 +215,19 @@ class Client:
                 mode=RunMode.ASYNC,
                 **(await self._prepare_session_for_run(base_url=base_url)),
             ).model_dump_json(),
+            headers=self._idempotency_headers(idempotency_key),
         )
         self._raise_error(response)
         response = RunCreateResponse.model_validate(response.json())
         return Run(**response.model_dump())
 
     async def run_stream(
-        self, input: Input, *, agent: AgentName, base_url: httpx.URL | str | None = None
+        self,
+        input: Input,
+        *,
+        agent: AgentName,
+        idempotency_key: str | None = None,
+        base_url: httpx.URL | str | None = None,
     ) -> AsyncIterator[Event]:
         async with aconnect_sse(
             self._client,
@@ -182,23 +237,131 @@ class Client:
                 agent_name=agent,
                 input=input_to_messages(input),
                 mode=RunMode.STREAM,
-                session=await self._prepare_session_for_run(base_url=base_url),
+                **(await self._prepare_session_for_run(base_url=base_url)),
             ).model_dump_json(),
+            headers={**self._event_mode_headers, **self._idempotency_headers(idempotency_key)},
         ) as event_source:
             async for event in self._validate_stream(event_source):
                 yield event
 
+    async def run_batch(
+        self, runs: list[tuple[AgentName, Input]], *, base_url: httpx.URL | str | None = None
+    ) -> list[Run]:
+        """Creates the runs in one request and waits for all of them"""
+        response = await self._client.post(
+            self._create_url("/runs/batch", base_url=base_url),
+            content=(await self._create_batch_request(runs, mode=RunMode.SYNC, base_url=base_url)).model_dump_json(),
+        )
+        self._raise_error(response)
+        return RunBatchCreateResponse.model_validate(response.json()).runs
+
+    async def run_batch_async(
+        self, runs: list[tuple[AgentName, Input]], *, base_url: httpx.URL | str | None = None
+    ) -> list[Run]:
+        response = await self._client.post(
+            self._create_url("/runs/batch", base_url=base_url),
+            content=(await self._create_batch_request(runs, mode=RunMode.ASYNC, base_url=base_url)).model_dump_json(),
+        )
+        self._raise_error(response)
+        return RunBatchCreateResponse.model_validate(response.json()).runs
+
+    async def run_batch_stream(
+        self, runs: list[tuple[AgentName, Input]], *, base_url: httpx.URL | str | None = None
+    ) -> AsyncIterator[tuple[RunId, Event]]:
+        """Streams events of all the runs over one connection, paired with the id of the run they belong to"""
+        async with aconnect_sse(
+            self._client,
+            "POST",
+            self._create_url("/runs/batch", base_url=base_url),
+            content=(await self._create_batch_request(runs, mode=RunMode.STREAM, base_url=base_url)).model_dump_json(),
+            headers=self._event_mode_headers,
+        ) as event_source:
+            if event_source.response.is_error:
+                await event_source.response.aread()
+                self._raise_error(event_source.response)
+            async for sse in event_source.aiter_sse():
+                batch_event = RunBatchEvent.model_validate_json(sse.data)
+                yield batch_event.run_id, batch_event.event
+
     async def run_status(self, *, run_id: RunId, base_url: httpx.URL | str | None = None) -> Run:
         response = await self._client.get(self._create_url(f"/runs/{run_id}", base_url=base_url))
         self._raise_error(response)
         return Run.model_validate(response.json())
 
-    async def run_events(self, *, run_id: RunId, base_url: httpx.URL | str | None = None) -> AsyncIterator[Event]:
-        response = await self._client.get(self._create_url(f"/runs/{run_id}/events", base_url=base_url))
+    async def run_wait(
+        self,
+        *,
+        run_id: RunId,
+        since_status: RunStatus | None = None,
+        wait: timedelta = timedelta(seconds=30),
+        base_url: httpx.URL | str | None = None,
+    ) -> Run:
+        """Returns the run once its status differs from the given one, or the current one, or after the wait"""
+        params = {"wait": wait.total_seconds()}
+        if since_status is not None:
+            params["since_status"] = since_status.value
+        response = await self._client.get(
+            self._create_url(f"/runs/{run_id}", base_url=base_url),
+            params=params,
+            # The request is held by the server for up to the wait
+            timeout=wait.total_seconds() + 10,
+        )
         self._raise_error(response)
-        response = RunEventsListResponse.model_validate(response.json())
-        for event in response.events:
-            yield event
+        return Run.model_validate(response.json())
+
+    async def run_events(
+        self,
+        *,
+        run_id: RunId,
+        after: int | None = None,
+        types: list[str] | None = None,
+        page_size: int | None = None,
+        base_url: httpx.URL | str | None = None,
+    ) -> AsyncIterator[Event]:
+        """Iterates events of the run after the given index, fetching them in pages when the page size is set"""
+        while True:
+            params = {"after": after, "limit": page_size, "type": types}
+            response = await self._client.get(
+                self._create_url(f"/runs/{run_id}/events", base_url=base_url),
+                params={key: value for key, value in params.items() if value is not None},
+                headers=self._event_mode_headers,
+            )
+            self._raise_error(response)
+            response = RunEventsListResponse.model_validate(response.json())
+            for event in response.events:
+                yield event
+            if not response.has_more:
+                return
+            after = response.last_event_id
+
+    async def run_events_stream(
+        self,
+        *,
+        run_id: RunId,
+        last_event_id: int | None = None,
+        max_reconnects: int = 3,
+        base_url: httpx.URL | str | None = None,
+    ) -> AsyncIterator[Event]:
+        """Follows the events of the run, reconnecting after dropped connections without repeating events"""
+        reconnects = 0
+        while True:
+            headers = {**self._event_mode_headers}
+            if last_event_id is not None:
+                headers["Last-Event-ID"] = str(last_event_id)
+            try:
+                async with aconnect_sse(
+                    self._client, "GET", self._create_url(f"/runs/{run_id}/stream", base_url=base_url), headers=headers
+                ) as event_source:
+                    async for id, event in self._validate_stream_with_ids(event_source):
+                        last_event_id = id if id is not None else last_event_id
+                        reconnects = 0
+                        yield event
+                return
+            except httpx.TransportError:
+                if reconnects >= max_reconnects:
+                    raise
+                reconnects += 1
+                logger.debug(f"Event stream dropped, reconnecting ({reconnects}/{max_reconnects})")
 
     async def run_cancel(self, *, run_id: RunId, base_url: httpx.URL | str | None = None) -> Run:
         response = await self._client.post(self._create_url(f"/runs/{run_id}/cancel", base_url=base_url))
@@ -236,10 +399,40 @@ class Client:
             "POST",
             self._create_url(f"/runs/{run_id}", base_url=base_url),
             content=RunResumeRequest(await_resume=await_resume, mode=RunMode.STREAM).model_dump_json(),
+            headers=self._event_mode_headers,
         ) as event_source:
             async for event in self._validate_stream(event_source):
                 yield event
 
+    @asynccontextmanager
+    async def websocket(self, *, base_url: httpx.URL | str | None = None) -> AsyncIterator[RunSocket]:
+        """Opens a connection multiplexing runs, avoiding a request per stream and resume"""
+        # Built by the HTTP client so that its params, headers, cookies and auth apply to the handshake as well
+        request = self._client.build_request(
+            "GET", self._create_url("/ws", base_url=base_url), headers=self._event_mode_headers
+        )
+        if self._client.auth is not None:
+            flow = self._client.auth.async_auth_flow(request)
+            request = await flow.__anext__()
+            await flow.aclose()
+        url = request.url.copy_with(scheme="wss" if request.url.scheme == "https" else "ws")
+        headers = [
+            (name, value) for name, value in request.headers.multi_items() if name.lower() not in WEBSOCKET_HEADERS
+        ]
+        ssl_context = (
+            httpx.create_ssl_context(**self._ssl_options) if self._ssl_options and url.scheme == "wss" else None
+        )
+        async with (
+            connect(
+                str(url),
+                additional_headers=headers,
+                user_agent_header=request.headers.get("User-Agent"),
+                ssl=ssl_context,
+            ) as connection,
+            RunSocket(connection, prepare_session=lambda: self._prepare_session_for_run(base_url=base_url)) as socket,
+        ):
+            yield socket
+
     async def refresh_session(
         self, *, base_url: httpx.URL | str | None = None, timeout: httpx._types.TimeoutTypes = 5000
     ) -> Session:
@@ -263,18 +456,44 @@ class Client:
 
             return self._session
 
+    async def _create_batch_request(
+        self, runs: list[tuple[AgentName, Input]], *, mode: RunMode, base_url: httpx.URL | str | None
+    ) -> RunBatchCreateRequest:
+        session = await self._prepare_session_for_run(base_url=base_url)
+        return RunBatchCreateRequest(
+            runs=[
+                RunCreateRequest(agent_name=agent, input=input_to_messages(input), **session) for agent, input in runs
+            ],
+            mode=mode,
+        )
+
+    @property
+    def _event_mode_headers(self) -> dict[str, str]:
+        return {"Event-Mode": self._event_mode.value}
+
+    def _idempotency_headers(self, idempotency_key: str | None) -> dict[str, str]:
+        # Retries carrying the same key get the run created by the first request instead of a new one
+        return {"Idempotency-Key": idempotency_key} if idempotency_key else {}
+
     async def _validate_stream(
         self,
         event_source: EventSource,
     ) -> AsyncIterator[Event]:
+        async for _, event in self._validate_stream_with_ids(event_source):
+            yield event
+
+    async def _validate_stream_with_ids(
+        self,
+        event_source: EventSource,
+    ) -> AsyncIterator[tuple[int | None, Event]]:
         if event_source.response.is_error:
             await event_source.response.aread()
             self._raise_error(event_source.response)
-        async for event in event_source.aiter_sse():
-            event: Event = TypeAdapter(Event).validate_json(event.data)
+        async for sse in event_source.aiter_sse():
+            event: Event = TypeAdapter(Event).validate_json(sse.data)
             if isinstance(event, ErrorEvent):
                 raise ACPError(error=event.error)
-            yield event
+            yield int(sse.id) if sse.id else None, event
 
     def _raise_error(self, response: httpx.Response) -> None:
         try:
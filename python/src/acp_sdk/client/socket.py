@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable
+from types import TracebackType
+from typing import Self
+
+from pydantic import TypeAdapter
+from websockets.asyncio.client import ClientConnection
+from websockets.exceptions import ConnectionClosed
+
+from acp_sdk.client.types import Input
+from acp_sdk.client.utils import input_to_messages
+from acp_sdk.models import (
+    ACPError,
+    AgentName,
+    AwaitResume,
+    ErrorEvent,
+    Event,
+    Run,
+    RunCreateRequest,
+    RunId,
+    RunMode,
+    SocketDone,
+    SocketError,
+    SocketEvent,
+    SocketResponse,
+    SocketRunCancelRequest,
+    SocketRunCreateRequest,
+    SocketRunResumeRequest,
+)
+
+logger = logging.getLogger(__name__)
+
+socket_response_adapter = TypeAdapter(SocketResponse)
+
+
+class RunSocket:
+    """Runs multiplexed over a single WebSocket connection"""
+
+    def __init__(
+        self, connection: ClientConnection, *, prepare_session: Callable[[], Awaitable[dict]] | None = None
+    ) -> None:
+        self._connection = connection
+        self._prepare_session = prepare_session
+        self._streams: dict[str, asyncio.Queue[SocketEvent | SocketDone | SocketError | None]] = {}
+        self._reader: asyncio.Task | None = None
+
+    async def __aenter__(self) -> Self:
+        self._reader = asyncio.create_task(self._read())
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None = None,
+        exc_value: BaseException | None = None,
+        traceback: TracebackType | None = None,
+    ) -> None:
+        if self._reader:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+
+    async def run_stream(self, input: Input, *, agent: AgentName) -> AsyncIterator[Event]:
+        request = RunCreateRequest(
+            agent_name=agent,
+            input=input_to_messages(input),
+            mode=RunMode.STREAM,
+            **(await self._prepare_session() if self._prepare_session else {}),
+        )
+        async for event in self._stream(SocketRunCreateRequest(ref=str(uuid.uuid4()), request=request)):
+            yield event
+
+    async def run_resume_stream(self, await_resume: AwaitResume, *, run_id: RunId) -> AsyncIterator[Event]:
+        request = SocketRunResumeRequest(ref=str(uuid.uuid4()), run_id=run_id, await_resume=await_resume)
+        async for event in self._stream(request):
+            yield event
+
+    async def run_cancel(self, *, run_id: RunId) -> Run:
+        async for response in self._request(SocketRunCancelRequest(ref=str(uuid.uuid4()), run_id=run_id)):
+            if isinstance(response, SocketDone):
+                return response.run
+        raise ConnectionError("WebSocket connection closed")
+
+    async def _stream(self, request: SocketRunCreateRequest | SocketRunResumeRequest) -> AsyncIterator[Event]:
+        async for response in self._request(request):
+            if isinstance(response, SocketEvent):
+                if isinstance(response.event, ErrorEvent):
+                    raise ACPError(error=response.event.error)
+                yield response.event
+
+    async def _request(
+        self, request: SocketRunCreateRequest | SocketRunResumeRequest | SocketRunCancelRequest
+    ) -> AsyncIterator[SocketEvent | SocketDone]:
+        queue: asyncio.Queue[SocketEvent | SocketDone | SocketError | None] = asyncio.Queue()
+        self._streams[request.ref] = queue
+        try:
+            await self._connection.send(request.model_dump_json())
+            while True:
+                response = await queue.get()
+                if response is None:
+                    raise ConnectionError("WebSocket connection closed")
+                if isinstance(response, SocketError):
+                    raise ACPError(error=response.error)
+                yield response
+                if isinstance(response, SocketDone):
+                    return
+        finally:
+            del self._streams[request.ref]
+
+    async def _read(self) -> None:
+        try:
+            async for message in self._connection:
+                response = socket_response_adapter.validate_json(message)
+                if isinstance(response, SocketError) and response.ref is None:
+                    # The server could not tell which request failed, none of the pending ones can be trusted
+                    for queue in self._streams.values():
+                        queue.put_nowait(response)
+                    continue
+                queue = self._streams.get(response.ref) if response.ref else None
+                if queue is None:
+                    logger.warning(f"Unexpected response on run socket: {message}")
+                    continue
+                queue.put_nowait(response)
+        except ConnectionClosed:
+            pass
+        finally:
+            # Unblocks requests still waiting for a response
+            for queue in self._streams.values():
+                queue.put_nowait(None)
@@ -1,7 +1,11 @@
-from opentelemetry import trace
+from opentelemetry import metrics, trace
 
 from acp_sdk.version import __version__
 
 
 def get_tracer() -> trace.Tracer:
     return trace.get_tracer("acp-sdk", __version__)
+
+
+def get_meter() -> metrics.Meter:
+    return metrics.get_meter("acp-sdk", __version__)
@@ -1,14 +1,17 @@
 import asyncio
+import math
+import struct
 import uuid
-from collections.abc import AsyncIterator
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable
 from datetime import datetime, timezone
 from enum import Enum
-from typing import Any, Literal, Optional, Union
+from typing import Any, ClassVar, Literal, Optional, Union
 
-from pydantic import AnyUrl, BaseModel, ConfigDict, Field
+from pydantic import AnyUrl, BaseModel, ConfigDict, Field, PrivateAttr
 
 from acp_sdk.models.errors import ACPError, Error
-from acp_sdk.models.types import AgentName, ResourceId, ResourceUrl, RunId, SessionId
+from acp_sdk.models.types import AgentName, ResourceUrl, RunId, SessionId
 from acp_sdk.shared import ResourceLoader, ResourceStore
 
 
@@ -135,22 +138,27 @@ class Message(BaseModel):
                 and second.content_url is None
             )
 
-        def join(first: MessagePart, second: MessagePart) -> MessagePart:
+        def join(group: list[MessagePart]) -> MessagePart:
+            if len(group) == 1:
+                return group[0]
             return MessagePart(
                 name=None,
                 content_type="text/plain",
-                content=first.content + second.content,
+                content="".join(part.content for part in group),
                 content_encoding="plain",
                 content_url=None,
             )
 
-        parts: list[MessagePart] = []
+        # Joinable runs are collected first so that each is concatenated once
+        groups: list[list[MessagePart]] = []
         for part in self.parts:
-            if len(parts) > 0 and can_be_joined(parts[-1], part):
-                parts[-1] = join(parts[-1], part)
+            if groups and can_be_joined(groups[-1][-1], part):
+                groups[-1].append(part)
             else:
-                parts.append(part)
-        return Message(parts=parts, created_at=self.created_at, completed_at=self.completed_at)
+                groups.append([part])
+        return Message(
+            parts=[join(group) for group in groups], created_at=self.created_at, completed_at=self.completed_at
+        )
 
 
 class RunMode(str, Enum):
@@ -159,6 +167,13 @@ class RunMode(str, Enum):
     STREAM = "stream"
 
 
+class EventMode(str, Enum):
+    """How much of the run status events carry, compact events leave the output to the message events"""
+
+    FULL = "full"
+    COMPACT = "compact"
+
+
 class RunStatus(str, Enum):
     CREATED = "created"
     IN_PROGRESS = "in-progress"
@@ -285,6 +300,42 @@ Event = Union[
     MessagePartEvent,
 ]
 
+RunStatusEvent = Union[
+    RunCreatedEvent,
+    RunInProgressEvent,
+    RunAwaitingEvent,
+    RunCancelledEvent,
+    RunFailedEvent,
+    RunCompletedEvent,
+]
+
+
+def compact_event(event: Event) -> Event:
+    """Strips the output from the run of a status event, other events are returned as they are"""
+    if isinstance(event, RunStatusEvent) and event.run.output:
+        return event.model_copy(update={"run": event.run.model_copy(update={"output": []})})
+    return event
+
+
+class EventExpander:
+    """Rebuilds the run output of compact status events from the message events preceding them"""
+
+    def __init__(self) -> None:
+        self.output: list[Message] = []
+
+    def expand(self, event: Event) -> Event:
+        match event:
+            case MessageCreatedEvent():
+                self.output.append(event.message.model_copy(update={"parts": []}))
+            case MessagePartEvent() | ArtifactEvent() if self.output:
+                self.output[-1].parts.append(event.part)
+            case MessageCompletedEvent() if self.output:
+                self.output[-1] = event.message
+            case _ if isinstance(event, RunStatusEvent):
+                output = [message.model_copy(deep=True) for message in self.output]
+                return event.model_copy(update={"run": event.run.model_copy(update={"output": output})})
+        return event
+
 
 class Agent(BaseModel):
     name: str
@@ -292,32 +343,202 @@ class Agent(BaseModel):
     metadata: Metadata = Metadata()
 
 
+class HistorySegment(BaseModel):
+    """Messages stored as a single JSON Lines resource, offsets delimit individual messages in bytes"""
+
+    url: ResourceUrl
+    offsets: list[int]
+
+    @classmethod
+    def encode(cls, messages: list[Message]) -> tuple[bytes, list[int]]:
+        lines = [message.model_dump_json().encode() + b"\n" for message in messages]
+        offsets = [0]
+        for line in lines:
+            offsets.append(offsets[-1] + len(line))
+        return b"".join(lines), offsets
+
+    def decode(self, data: bytes, *, skip: int = 0, partial: bool = False) -> list[Message]:
+        """Decodes the messages after the first `skip`, partial data starts at the first decoded message"""
+        offsets = self.offsets[skip:]
+        base = offsets[0] if partial else 0
+        return [
+            Message.model_validate_json(data[start - base : end - base]) for start, end in zip(offsets, offsets[1:])
+        ]
+
+    def range(self, *, skip: int = 0) -> tuple[int, int]:
+        """Byte range holding the messages after the first `skip`"""
+        return self.offsets[skip], self.offsets[-1]
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+class StatePatch(BaseModel):
+    """Replaces `length` bytes at `offset` of the previous state with `data`"""
+
+    offset: int
+    length: int
+    data: bytes
+
+    HEADER: ClassVar[struct.Struct] = struct.Struct(">QQ")
+
+    @classmethod
+    def diff(cls, old: bytes, new: bytes) -> "StatePatch | None":
+        """Computes a single replacement turning old into new, None if they are equal"""
+        if old == new:
+            return None
+        old_view, new_view = memoryview(old), memoryview(new)
+        prefix = _common_length(lambda n: old_view[:n] == new_view[:n], min(len(old), len(new)))
+        suffix = _common_length(
+            lambda n: old_view[len(old) - n :] == new_view[len(new) - n :], min(len(old), len(new)) - prefix
+        )
+        return cls(offset=prefix, length=len(old) - prefix - suffix, data=new[prefix : len(new) - suffix])
+
+    def apply(self, state: bytes) -> bytes:
+        return state[: self.offset] + self.data + state[self.offset + self.length :]
+
+    def encode(self) -> bytes:
+        return self.HEADER.pack(self.offset, self.length) + self.data
+
+    @classmethod
+    def decode(cls, data: bytes) -> "StatePatch":
+        offset, length = cls.HEADER.unpack_from(data)
+        return cls(offset=offset, length=length, data=data[cls.HEADER.size :])
+
+
+def _common_length(matches: Callable[[int], bool], limit: int) -> int:
+    # Binary search over slice comparisons, which run in C unlike a byte by byte loop
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if matches(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
 class Session(BaseModel):
     id: SessionId = Field(default_factory=uuid.uuid4)
     history: list[ResourceUrl] = Field(default_factory=list)
+    segments: list[HistorySegment] = Field(default_factory=list)
     state: ResourceUrl | None = None
+    state_patches: list[ResourceUrl] = Field(default_factory=list)
 
     loader: ResourceLoader | None = Field(None, exclude=True)
     store: ResourceStore | None = Field(None, exclude=True)
 
+    # Last assembled state together with the state and patches it was assembled from
+    _held_state: tuple[ResourceUrl | None, list[ResourceUrl], bytes] | None = PrivateAttr(None)
+
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
-    async def load_history(self, *, loader: ResourceLoader | None = None) -> AsyncIterator[Message]:
+    async def load_history(
+        self, *, loader: ResourceLoader | None = None, last_n: int | None = None, concurrency: int = 8
+    ) -> AsyncIterator[Message]:
+        """Yields messages in order while prefetching up to `concurrency` resources, optionally only the last n"""
         loader = loader or self.loader or ResourceLoader()
-        for url in self.history:
-            data = await loader.load(url)
-            yield Message.model_validate_json(data)
+
+        async def load(source: ResourceUrl | HistorySegment, skip: int) -> list[Message]:
+            if isinstance(source, HistorySegment):
+                if skip:
+                    # Only the tail of the segment is needed
+                    return source.decode(
+                        await loader.load_range(source.url, source.range(skip=skip)), skip=skip, partial=True
+                    )
+                return source.decode(await loader.load(source.url))
+            return [Message.model_validate_json(await loader.load(source))]
+
+        window: list[tuple[ResourceUrl | HistorySegment, int]] = []
+        remaining = last_n if last_n is not None else math.inf
+        for source in reversed([*self.history, *self.segments]):
+            if remaining <= 0:
+                break
+            count = len(source) if isinstance(source, HistorySegment) else 1
+            window.append((source, max(count - remaining, 0)))
+            remaining -= count
+        window.reverse()
+
+        tasks: deque[asyncio.Task[list[Message]]] = deque()
+        try:
+            for source, skip in window:
+                tasks.append(asyncio.create_task(load(source, skip)))
+                if len(tasks) >= concurrency:
+                    for message in await tasks.popleft():
+                        yield message
+            while tasks:
+                for message in await tasks.popleft():
+                    yield message
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     async def load_state(self, *, loader: ResourceLoader | None = None) -> bytes:
+        if (held := self._get_held_state()) is not None:
+            return held
         loader = loader or self.loader or ResourceLoader()
-        data = await loader.load(self.state)
+        data, *patches = await asyncio.gather(loader.load(self.state), *map(loader.load, self.state_patches))
+        for patch in patches:
+            data = StatePatch.decode(patch).apply(data)
+        self._hold_state(data)
         return data
 
-    async def store_state(self, data: bytes, *, store: ResourceStore | None = None) -> ResourceUrl:
+    def _get_held_state(self) -> bytes | None:
+        if self._held_state is None:
+            return None
+        state, patches, data = self._held_state
+        # Fields may have been reassigned since, e.g. by a session read back from the store
+        return data if state == self.state and patches == self.state_patches else None
+
+    def _hold_state(self, data: bytes) -> None:
+        self._held_state = (self.state, list(self.state_patches), data)
+
+    async def load_state_stream(self, *, loader: ResourceLoader | None = None) -> AsyncIterator[bytes]:
+        loader = loader or self.loader or ResourceLoader()
+        if self.state_patches:
+            # Patches can touch any part of the state, it has to be assembled first
+            yield await self.load_state(loader=loader)
+            return
+        async for chunk in loader.load_stream(self.state):
+            yield chunk
+
+    async def update_state(
+        self,
+        data: bytes,
+        *,
+        store: ResourceStore | None = None,
+        loader: ResourceLoader | None = None,
+        compact_after: int = 16,
+    ) -> None:
+        """Persists the state as a patch of the current one, compacting into a new snapshot after enough patches"""
+        store = store or self.store
+        if not store:
+            raise ValueError("Store must be specified")
+
+        patch = None
+        if self.state is not None and len(self.state_patches) < compact_after:
+            # Only a session without the previous state at hand has to assemble it from storage
+            patch = StatePatch.diff(await self.load_state(loader=loader), data)
+            if patch is None:
+                return
+        if patch is None or len(patch.data) >= len(data) // 2:
+            self.state = await self.store_state(data, store=store)
+            self.state_patches = []
+        else:
+            self.state_patches.append(await self.store_state(patch.encode(), store=store))
+        self._hold_state(data)
+
+    async def store_state(
+        self, data: bytes | Iterable[bytes] | AsyncIterable[bytes], *, store: ResourceStore | None = None
+    ) -> ResourceUrl:
         store = store or self.store
         if not store:
             raise ValueError("Store must be specified")
 
-        id = ResourceId()
-        await store.store(id, data)
+        if isinstance(data, bytes):
+            id = await store.store_content(data)
+        else:
+            id = uuid.uuid4()
+            await store.store(id, data)
         return await store.url(id)
@@ -1,5 +1,9 @@
-from pydantic import BaseModel
+from datetime import timedelta
+from typing import Annotated, Literal, Union
 
+from pydantic import BaseModel, Field
+
+from acp_sdk.models.errors import Error
 from acp_sdk.models.models import (
     Agent,
     AgentName,
@@ -11,6 +15,7 @@ from acp_sdk.models.models import (
     Session,
     SessionId,
 )
+from acp_sdk.models.types import RunId
 
 
 class PingResponse(BaseModel):
@@ -31,12 +36,29 @@ class RunCreateRequest(BaseModel):
     session: Session | None = None
     input: list[Message]
     mode: RunMode = RunMode.SYNC
+    timeout: timedelta | None = None
+    await_timeout: timedelta | None = None
 
 
 class RunCreateResponse(Run):
     pass
 
 
+class RunBatchCreateRequest(BaseModel):
+    runs: list[RunCreateRequest] = Field(min_length=1)
+    # Applies to the whole batch, modes of the individual requests are ignored
+    mode: RunMode = RunMode.SYNC
+
+
+class RunBatchCreateResponse(BaseModel):
+    runs: list[Run]
+
+
+class RunBatchEvent(BaseModel):
+    run_id: RunId
+    event: Event
+
+
 class RunResumeRequest(BaseModel):
     await_resume: AwaitResume
     mode: RunMode
@@ -56,7 +78,56 @@ class RunCancelResponse(Run):
 
 class RunEventsListResponse(BaseModel):
     events: list[Event]
+    last_event_id: int | None = None
+    has_more: bool = False
 
 
 class SessionReadResponse(Session):
     pass
+
+
+class SocketRunCreateRequest(BaseModel):
+    type: Literal["run.create"] = "run.create"
+    ref: str
+    request: RunCreateRequest
+
+
+class SocketRunResumeRequest(BaseModel):
+    type: Literal["run.resume"] = "run.resume"
+    ref: str
+    run_id: RunId
+    await_resume: AwaitResume
+
+
+class SocketRunCancelRequest(BaseModel):
+    type: Literal["run.cancel"] = "run.cancel"
+    ref: str
+    run_id: RunId
+
+
+SocketRequest = Annotated[
+    Union[SocketRunCreateRequest, SocketRunResumeRequest, SocketRunCancelRequest], Field(discriminator="type")
+]
+
+
+class SocketEvent(BaseModel):
+    type: Literal["event"] = "event"
+    ref: str
+    event: Event
+
+
+class SocketDone(BaseModel):
+    """Sent after the last event of the request with the ref, once the run finished or awaits"""
+
+    type: Literal["done"] = "done"
+    ref: str
+    run: Run
+
+
+class SocketError(BaseModel):
+    type: Literal["error"] = "error"
+    ref: str | None = None
+    error: Error
+
+
+SocketResponse = Annotated[Union[SocketEvent, SocketDone, SocketError], Field(discriminator="type")]
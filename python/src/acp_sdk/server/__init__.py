@@ -2,10 +2,12 @@ from acp_sdk.server.agent import Agent as Agent
 from acp_sdk.server.agent import agent as agent
 from acp_sdk.server.app import create_app as create_app
 from acp_sdk.server.context import Context as Context
+from acp_sdk.server.recovery import RecoveryPolicy as RecoveryPolicy
 from acp_sdk.server.server import Server as Server
 from acp_sdk.server.store import MemoryStore as MemoryStore
 from acp_sdk.server.store import PostgreSQLStore as PostgreSQLStore
 from acp_sdk.server.store import RedisStore as RedisStore
 from acp_sdk.server.store import Store as Store
+from acp_sdk.server.thread_pool import ThreadPoolConfig as ThreadPoolConfig
 from acp_sdk.server.types import RunYield as RunYield
 from acp_sdk.server.types import RunYieldResume as RunYieldResume
@@ -1,10 +1,13 @@
 import abc
 import inspect
 from collections.abc import AsyncGenerator, Coroutine, Generator
+from datetime import timedelta
 from typing import Callable
 
 from acp_sdk.models import AgentName, Message, Metadata
 from acp_sdk.server.context import Context
+from acp_sdk.server.recovery import RecoveryPolicy
+from acp_sdk.server.thread_pool import ThreadPoolConfig
 from acp_sdk.server.types import RunYield, RunYieldResume
 
 
@@ -21,6 +24,26 @@ class Agent(abc.ABC):
     def metadata(self) -> Metadata:
         return Metadata()
 
+    @property
+    def thread_pool(self) -> ThreadPoolConfig | None:
+        """Configuration of a dedicated thread pool, the agent shares the server pool when None"""
+        return None
+
+    @property
+    def timeout(self) -> timedelta | None:
+        """Maximum wall time of a run, including time spent awaiting"""
+        return None
+
+    @property
+    def await_timeout(self) -> timedelta | None:
+        """Maximum time a run waits to be resumed"""
+        return None
+
+    @property
+    def recovery_policy(self) -> RecoveryPolicy:
+        """How runs abandoned by a crashed worker are recovered"""
+        return RecoveryPolicy.FAIL
+
     @abc.abstractmethod
     def run(
         self, input: list[Message], context: Context
@@ -35,6 +58,10 @@ def agent(
     description: str | None = None,
     *,
     metadata: Metadata | None = None,
+    thread_pool: ThreadPoolConfig | None = None,
+    timeout: timedelta | None = None,
+    await_timeout: timedelta | None = None,
+    recovery_policy: RecoveryPolicy = RecoveryPolicy.FAIL,
 ) -> Callable[[Callable], Agent]:
     """Decorator to create an agent."""
 
@@ -64,6 +91,22 @@ def agent(
             def metadata(self) -> Metadata:
                 return metadata or Metadata()
 
+            @property
+            def thread_pool(self) -> ThreadPoolConfig | None:
+                return thread_pool
+
+            @property
+            def timeout(self) -> timedelta | None:
+                return timeout
+
+            @property
+            def await_timeout(self) -> timedelta | None:
+                return await_timeout
+
+            @property
+            def recovery_policy(self) -> RecoveryPolicy:
+                return recovery_policy
+
         agent: Agent
         if inspect.isasyncgenfunction(fn):
 
@@ -1,18 +1,36 @@
 import asyncio
-from collections.abc import AsyncGenerator
+import hashlib
+import uuid
+from collections.abc import AsyncGenerator, AsyncIterator
 from concurrent.futures import ThreadPoolExecutor
-from contextlib import asynccontextmanager
-from datetime import timedelta
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager
+from datetime import datetime, timedelta, timezone
 from enum import Enum
+from typing import Annotated, Any
 
 import httpx
 import obstore.store
-from fastapi import Depends, FastAPI, HTTPException, Request, status
+from cachetools import LRUCache
+from fastapi import (
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    WebSocketException,
+    status,
+)
 from fastapi.applications import AppType, Lifespan
-from fastapi.encoders import jsonable_encoder
+from fastapi.dependencies.models import Dependant
+from fastapi.dependencies.utils import get_parameterless_sub_dependant, solve_dependencies
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
-from obstore.exceptions import NotFoundError
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIWebSocketRoute
+from pydantic import TypeAdapter, ValidationError
 
 from acp_sdk.models import (
     ACPError,
@@ -20,14 +38,23 @@ from acp_sdk.models import (
     AgentReadResponse,
     AgentsListResponse,
     AwaitResume,
+    Error,
+    ErrorCode,
+    Event,
+    EventExpander,
+    EventMode,
+    Message,
     PingResponse,
     ResourceId,
     ResourceUrl,
     Run,
+    RunBatchCreateRequest,
+    RunBatchCreateResponse,
     RunCancelResponse,
     RunCreateRequest,
     RunCreateResponse,
     RunEventsListResponse,
+    RunFailedEvent,
     RunId,
     RunMode,
     RunReadResponse,
@@ -37,27 +64,56 @@ from acp_sdk.models import (
     Session,
     SessionId,
     SessionReadResponse,
+    SocketDone,
+    SocketError,
+    SocketEvent,
+    SocketRequest,
+    SocketRunCancelRequest,
+    SocketRunCreateRequest,
+    SocketRunResumeRequest,
+    compact_event,
 )
 from acp_sdk.models import (
     Agent as AgentModel,
 )
 from acp_sdk.server.agent import Agent
+from acp_sdk.server.compression import CompressionMiddleware
+from acp_sdk.server.dispatcher import Dispatcher
 from acp_sdk.server.errors import (
     RequestValidationError,
     StarletteHTTPException,
     acp_error_handler,
     catch_all_exception_handler,
     http_exception_handler,
+    status_code_to_error_code,
     validation_exception_handler,
 )
-from acp_sdk.server.executor import CancelData, Executor, RunData
+from acp_sdk.server.executor import CancelData, Executor, IdempotencyData, RunData, RunEventsData
+from acp_sdk.server.logging import logger
+from acp_sdk.server.recovery import Lease, LeaseKeeper, RecoveryPolicy
+from acp_sdk.server.resources import LocalResourceLoader, serve_resource
+from acp_sdk.server.responses import ModelResponse
 from acp_sdk.server.store import MemoryStore, Store
-from acp_sdk.server.utils import stream_sse, wait_util_stop
+from acp_sdk.server.thread_pool import InstrumentedThreadPoolExecutor, ThreadPoolConfig
+from acp_sdk.server.utils import (
+    encode_events_page,
+    frame_sse,
+    replay_sse,
+    replay_util_stop,
+    stream_batch_sse,
+    stream_events,
+    stream_sse,
+    wait_util_stop,
+)
 from acp_sdk.shared import ResourceLoader, ResourceStore
 
+socket_request_adapter = TypeAdapter(SocketRequest)
+
 
 class Headers(str, Enum):
     RUN_ID = "Run-ID"
+    EVENT_MODE = "Event-Mode"
+    IDEMPOTENCY_KEY = "Idempotency-Key"
 
 
 def create_app(
@@ -68,6 +124,16 @@ def create_app(
     forward_resources: bool = True,
     lifespan: Lifespan[AppType] | None = None,
     dependencies: list[Depends] | None = None,
+    thread_pool: ThreadPoolConfig | None = None,
+    lease_ttl: timedelta = timedelta(seconds=30),
+    defer_session_recording: bool = False,
+    session_segment_size: int = 1024 * 1024,
+    coalesce_parts: bool = False,
+    sse_keep_alive: timedelta | None = timedelta(seconds=15),
+    sse_batch_window: timedelta | None = None,
+    idempotency_ttl: timedelta = timedelta(hours=24),
+    max_batch_size: int = 100,
+    compression: bool = False,
 ) -> FastAPI:
     if not forward_resources and (
         resource_store is None
@@ -76,60 +142,229 @@ def create_app(
         raise ValueError("Resource forwarding must be enabled when resource store does not support HTTP URLs")
 
     executor: ThreadPoolExecutor
+    agent_executors: dict[AgentName, ThreadPoolExecutor] = {}
     client = httpx.AsyncClient()
 
     @asynccontextmanager
     async def internal_lifespan(app: FastAPI) -> AsyncGenerator[None]:
         nonlocal executor
         async with client:
-            with ThreadPoolExecutor() as exec:
-                executor = exec
-                if not lifespan:
-                    yield None
-                else:
-                    async with lifespan(app) as state:
-                        yield state
+            with ExitStack() as stack:
+                executor = stack.enter_context(InstrumentedThreadPoolExecutor(name="default", config=thread_pool))
+                for agent in agents.values():
+                    if agent.thread_pool is not None:
+                        agent_executors[agent.name] = stack.enter_context(
+                            InstrumentedThreadPoolExecutor(name=agent.name, config=agent.thread_pool)
+                        )
+                async with run_dispatcher, cancel_dispatcher, resume_dispatcher, lease_keeper:
+                    if not lifespan:
+                        yield None
+                    else:
+                        async with lifespan(app) as state:
+                            yield state
 
     app = FastAPI(
         lifespan=internal_lifespan,
         dependencies=dependencies,
     )
 
+    allowed_origins = ["https://agentcommunicationprotocol.dev"]
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=["https://agentcommunicationprotocol.dev"],
+        allow_origins=allowed_origins,
         allow_methods=["*"],
         allow_headers=["*"],
         allow_credentials=True,
     )
+    if compression:
+        app.add_middleware(CompressionMiddleware)
 
     agents: dict[AgentName, Agent] = {agent.name: agent for agent in agents}
 
     store = store or MemoryStore(limit=1000, ttl=timedelta(hours=1))
     run_store = store.as_store(model=RunData, prefix="run_")
+    run_events_store = store.as_store(model=RunEventsData, prefix="run_")
+    # Expanders left at the end of event pages, by run and the last event id of the page
+    event_expanders: LRUCache[RunId, dict[int, EventExpander]] = LRUCache(maxsize=1000)
     run_cancel_store = store.as_store(model=CancelData, prefix="run_cancel_")
     run_resume_store = store.as_store(model=AwaitResume, prefix="run_resume_")
     session_store = store.as_store(model=Session, prefix="session_")
+    idempotency_store = store.as_store(model=IdempotencyData, prefix="run_idempotency_")
+
+    run_dispatcher = Dispatcher(run_store)
+    cancel_dispatcher = Dispatcher(run_cancel_store)
+    resume_dispatcher = Dispatcher(run_resume_store)
+
+    lease_keeper = LeaseKeeper(
+        # Outside of the `run_` prefix so that renewals do not wake the run dispatcher
+        store.as_store(model=Lease, prefix="lease_"),
+        worker_id=str(uuid.uuid4()),
+        ttl=lease_ttl,
+    )
 
-    resource_loader = resource_loader or ResourceLoader(client=client)
     resource_store = resource_store or ResourceStore(store=obstore.store.MemoryStore())
+    resource_loader = resource_loader or LocalResourceLoader(store=resource_store, client=client)
 
     app.exception_handler(ACPError)(acp_error_handler)
     app.exception_handler(StarletteHTTPException)(http_exception_handler)
     app.exception_handler(RequestValidationError)(validation_exception_handler)
     app.exception_handler(Exception)(catch_all_exception_handler)
 
-    async def find_run_data(run_id: RunId) -> RunData:
+    async def find_run_data(run_id: RunId, req: Request | WebSocket) -> RunData:
         run_data = await run_store.get(run_id)
         if not run_data:
             raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
         if run_data.run.status.is_terminal:
             return run_data
+        if await lease_keeper.is_abandoned(run_data.key, since=run_data.run.created_at):
+            run_data = await recover_run(run_data, req)
+            if run_data.run.status.is_terminal:
+                return run_data
         cancel_data = await run_cancel_store.get(run_data.key)
         if cancel_data is not None:
             run_data.run.status = RunStatus.CANCELLING
         return run_data
 
+    async def find_run_events(run_id: RunId, req: Request) -> list[Event | Any]:
+        """Events of the run, left unvalidated unless the run had to be recovered"""
+        run_data = await run_events_store.get(run_id)
+        if not run_data:
+            raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+        if not run_data.run.status.is_terminal and await lease_keeper.is_abandoned(
+            str(run_id), since=run_data.run.created_at
+        ):
+            return (await find_run_data(run_id, req)).events
+        return run_data.events
+
+    def sse_response(
+        stream: AsyncIterator[str], *, mode: EventMode, headers: dict[str, str] | None = None
+    ) -> StreamingResponse:
+        return StreamingResponse(
+            frame_sse(stream, keep_alive=sse_keep_alive, batch_window=sse_batch_window),
+            headers={**(headers or {}), Headers.EVENT_MODE: mode.value},
+            media_type="text/event-stream",
+        )
+
+    def event_mode(req: Request | WebSocket) -> EventMode:
+        # Unknown modes fall back to full events, the mode actually used is sent back in the response headers
+        try:
+            return EventMode(req.headers.get(Headers.EVENT_MODE, EventMode.FULL))
+        except ValueError:
+            return EventMode.FULL
+
+    def min_timeout(*timeouts: timedelta | None) -> timedelta | None:
+        return min((timeout for timeout in timeouts if timeout is not None), default=None)
+
+    def start_run(
+        agent: Agent,
+        run_data: RunData,
+        session: Session,
+        input: list[Message],
+        req: Request | WebSocket,
+        *,
+        ready: asyncio.Event,
+        timeout: timedelta | None = None,
+        await_timeout: timedelta | None = None,
+    ) -> None:
+        nonlocal executor
+
+        async def create_resource_url(id: ResourceId) -> ResourceUrl:
+            if forward_resources:
+                url = ResourceUrl(url=str(req.url_for("get_resource", resource_id=id)))
+                if isinstance(resource_loader, LocalResourceLoader):
+                    resource_loader.register(id, url)
+                return url
+            else:
+                return await resource_store.url(id)
+
+        Executor(
+            agent=agent,
+            run_data=run_data,
+            session=session,
+            session_store=session_store,
+            run_store=run_store,
+            cancel_dispatcher=cancel_dispatcher,
+            resume_store=run_resume_store,
+            resume_dispatcher=resume_dispatcher,
+            executor=agent_executors.get(agent.name, executor),
+            request=req,
+            resource_store=resource_store,
+            resource_loader=resource_loader,
+            create_resource_url=create_resource_url,
+            lease_keeper=lease_keeper,
+            timeout=timeout,
+            await_timeout=await_timeout,
+            defer_session_recording=defer_session_recording,
+            session_segment_size=session_segment_size,
+            coalesce_parts=coalesce_parts,
+        ).execute(input, wait=ready)
+
+    def detached_request(req: Request | WebSocket) -> Request:
+        """Request addressing this server that carries nothing of the request it is derived from"""
+        scheme = req.scope["scheme"]
+        return Request(
+            {
+                "type": "http",
+                "method": "POST",
+                "scheme": {"ws": "http", "wss": "https"}.get(scheme, scheme),
+                "server": req.scope.get("server"),
+                "root_path": req.scope.get("app_root_path", req.scope.get("root_path", "")),
+                "path": "/runs",
+                "query_string": b"",
+                "headers": [(b"host", req.headers["host"].encode())] if "host" in req.headers else [],
+                "app": req.scope["app"],
+                "router": req.scope.get("router"),
+            }
+        )
+
+    async def recover_run(run_data: RunData, req: Request | WebSocket) -> RunData:
+        if not await lease_keeper.acquire(run_data.key):
+            return run_data
+
+        agent = agents.get(run_data.run.agent_name, None)
+        if agent and agent.recovery_policy == RecoveryPolicy.RESTART and run_data.input is not None:
+            logger.info(f"Restarting abandoned run {run_data.key}")
+            run_data.run = Run(
+                run_id=run_data.run.run_id,
+                agent_name=run_data.run.agent_name,
+                session_id=run_data.run.session_id,
+                created_at=run_data.run.created_at,
+            )
+            run_data.events = []
+            session = (
+                await session_store.get(run_data.run.session_id) if run_data.run.session_id else None
+            ) or Session()
+            # Loader and store are not serialized, sessions read from the store come without them
+            session.loader, session.store = resource_loader, resource_store
+            run_data.run.session_id = session.id
+            await run_store.set(run_data.key, run_data)
+            ready = asyncio.Event()
+            ready.set()
+            # The run outlives the request that noticed it was abandoned, it must not run in its context
+            start_run(
+                agent,
+                run_data,
+                session,
+                run_data.input,
+                detached_request(req),
+                ready=ready,
+                timeout=(
+                    max(run_data.deadline - datetime.now(timezone.utc), timedelta(0))
+                    if run_data.deadline is not None
+                    else None
+                ),
+                await_timeout=run_data.await_timeout,
+            )
+        else:
+            logger.info(f"Failing abandoned run {run_data.key}")
+            run_data.run.status = RunStatus.FAILED
+            run_data.run.error = Error(code=ErrorCode.SERVER_ERROR, message="Run was abandoned by its worker")
+            run_data.run.finished_at = datetime.now(timezone.utc)
+            run_data.events.append(compact_event(RunFailedEvent(run=run_data.run.model_copy(deep=True))))
+            await run_store.set(run_data.key, run_data)
+            await lease_keeper.release(run_data.key)
+        return run_data
+
     def find_agent(agent_name: AgentName) -> Agent:
         agent = agents.get(agent_name, None)
         if not agent:
@@ -138,166 +373,429 @@ def create_app(
 
     @app.get("/agents")
     async def list_agents() -> AgentsListResponse:
-        return AgentsListResponse(
-            agents=[
-                AgentModel(name=agent.name, description=agent.description, metadata=agent.metadata)
-                for agent in agents.values()
-            ]
+        return ModelResponse(
+            AgentsListResponse(
+                agents=[
+                    AgentModel(name=agent.name, description=agent.description, metadata=agent.metadata)
+                    for agent in agents.values()
+                ]
+            )
         )
 
     @app.get("/agents/{name}")
     async def read_agent(name: AgentName) -> AgentReadResponse:
         agent = find_agent(name)
-        return AgentModel(name=agent.name, description=agent.description, metadata=agent.metadata)
+        return ModelResponse(AgentModel(name=agent.name, description=agent.description, metadata=agent.metadata))
 
     @app.get("/ping")
     async def ping() -> PingResponse:
-        return PingResponse()
-
-    @app.post("/runs")
-    async def create_run(request: RunCreateRequest, req: Request) -> RunCreateResponse:
-        agent = find_agent(request.agent_name)
+        return ModelResponse(PingResponse())
+
+    async def prepare_run(
+        request: RunCreateRequest, req: Request | WebSocket, *, run_id: RunId | None = None
+    ) -> tuple[RunData, asyncio.Event]:
+        [prepared] = await prepare_runs([request], req, run_ids=[run_id or uuid.uuid4()])
+        return prepared
+
+    async def prepare_runs(
+        requests: list[RunCreateRequest], req: Request | WebSocket, *, run_ids: list[RunId] | None = None
+    ) -> list[tuple[RunData, asyncio.Event]]:
+        """Creates the runs with one write per store, sessions shared by several runs are read once"""
+        run_agents = [find_agent(request.agent_name) for request in requests]
+
+        for request in requests:
+            if request.session_id and request.session and request.session_id != request.session.id:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Session ID mismatch")
+
+        session_ids = list({request.session_id for request in requests if request.session_id and not request.session})
+        stored_sessions = dict(zip(session_ids, await asyncio.gather(*map(session_store.get, session_ids))))
+
+        sessions: list[Session] = []
+        for request in requests:
+            session = request.session or (
+                (stored_sessions[request.session_id] or Session(id=request.session_id))
+                if request.session_id
+                else Session()
+            )
+            # Loader and store are not serialized, sessions read from the store or request come without them
+            session.loader, session.store = resource_loader, resource_store
+            sessions.append(session)
+
+        runs_data = []
+        for request, agent, session, run_id in zip(
+            requests, run_agents, sessions, run_ids or [uuid.uuid4() for _ in requests]
+        ):
+            run = Run(run_id=run_id, agent_name=agent.name, session_id=session.id)
+            timeout = min_timeout(agent.timeout, request.timeout)
+            runs_data.append(
+                RunData(
+                    run=run,
+                    input=request.input if agent.recovery_policy == RecoveryPolicy.RESTART else None,
+                    # Kept so that a restarted run is held to the limits of the request that created it
+                    deadline=run.created_at + timeout if timeout is not None else None,
+                    await_timeout=min_timeout(agent.await_timeout, request.await_timeout),
+                )
+            )
+        await lease_keeper.claim([run_data.key for run_data in runs_data])
+        await run_store.set_many({run_data.key: run_data for run_data in runs_data})
+        await session_store.set_many({session.id: session for session in sessions})
+
+        prepared = []
+        for request, agent, session, run_data in zip(requests, run_agents, sessions, runs_data):
+            ready = asyncio.Event()
+            start_run(
+                agent,
+                run_data,
+                session,
+                request.input,
+                req,
+                ready=ready,
+                timeout=min_timeout(agent.timeout, request.timeout),
+                await_timeout=run_data.await_timeout,
+            )
+            prepared.append((run_data, ready))
+        return prepared
 
-        if request.session_id and request.session and request.session_id != request.session.id:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Session ID mismatch")
+    async def prepare_resume(run_id: RunId, await_resume: AwaitResume, req: Request | WebSocket) -> RunData:
+        run_data = await find_run_data(run_id, req)
 
-        session = request.session or (
-            (
-                await session_store.get(request.session_id)
-                or Session(id=request.session_id, loader=resource_loader, store=resource_store)
+        # Runs failed by recovery keep their await request but have no executor to resume them
+        if run_data.run.status.is_terminal:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Run in terminal status {run_data.run.status} can't be resumed",
             )
-            if request.session_id
-            else Session(loader=resource_loader, store=resource_store)
-        )
 
-        nonlocal executor
-        run_data = RunData(
-            run=Run(
-                agent_name=agent.name,
-                session_id=session.id,
+        if run_data.run.await_request is None:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Run {run_id} has no await request")
+
+        if run_data.run.await_request.type != await_resume.type:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Run {run_id} is expecting resume of type {run_data.run.await_request.type}",
             )
-        )
+
+        run_data.run.status = RunStatus.IN_PROGRESS
         await run_store.set(run_data.key, run_data)
-        await session_store.set(session.id, session)
+        await run_resume_store.set(run_data.key, await_resume)
+        return run_data
+
+    async def request_cancel(run_id: RunId, req: Request | WebSocket) -> RunData:
+        run_data = await find_run_data(run_id, req)
+        if run_data.run.status.is_terminal:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Run in terminal status {run_data.run.status} can't be cancelled",
+            )
+        await run_cancel_store.set(run_data.key, CancelData())
+        run_data.run.status = RunStatus.CANCELLING
+        return run_data
 
+    async def claim_idempotency_key(key: str, body: bytes, *, run_id: RunId) -> RunId:
+        """Binds the key to the run id unless an earlier request did so, returns the run id the key is bound to"""
+        data = IdempotencyData(
+            run_id=run_id,
+            # The raw body is hashed, the parsed request contains defaults such as timestamps that differ per attempt
+            request_hash=hashlib.sha256(body).hexdigest(),
+            expires_at=datetime.now(timezone.utc) + idempotency_ttl,
+        )
+        claimed = await idempotency_store.get(key)
+        if claimed is None or claimed.is_expired:
+            await idempotency_store.set(key, data)
+            # Best effort protection against a concurrent request claiming the same key
+            claimed = await idempotency_store.get(key) or data
+        if claimed.request_hash != data.request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency key was already used with a different request",
+            )
+        return claimed.run_id
+
+    async def replay_run(run_id: RunId, mode: RunMode, req: Request) -> Response:
+        """Responds to a retried request with the run created by the original one"""
+        try:
+            run_data = await find_run_data(run_id, req)
+        except HTTPException as e:
+            if e.status_code != status.HTTP_404_NOT_FOUND:
+                raise
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Request with the same idempotency key is still being processed",
+            )
         headers = {Headers.RUN_ID: str(run_data.run.run_id)}
-        ready = asyncio.Event()
 
-        async def create_resource_url(id: ResourceId) -> ResourceUrl:
-            if forward_resources:
-                return ResourceUrl(url=str(req.url_for("get_resource", resource_id=id)))
-            else:
-                return await resource_store.url(id)
+        match mode:
+            case RunMode.STREAM:
+                events_mode = event_mode(req)
+                return sse_response(
+                    replay_sse(run_data, run_store, run_dispatcher, 0, mode=events_mode),
+                    mode=events_mode,
+                    headers=headers,
+                )
+            case RunMode.SYNC:
+                run_data = await replay_util_stop(run_data, run_store, run_dispatcher)
+                return ModelResponse(run_data.run, headers=headers)
+            case RunMode.ASYNC:
+                return ModelResponse(run_data.run, status_code=status.HTTP_202_ACCEPTED, headers=headers)
+            case _:
+                raise NotImplementedError()
 
-        Executor(
-            agent=agent,
-            run_data=run_data,
-            session=session,
-            session_store=session_store,
-            run_store=run_store,
-            cancel_store=run_cancel_store,
-            resume_store=run_resume_store,
-            executor=executor,
-            request=req,
-            resource_store=resource_store,
-            resource_loader=resource_loader,
-            create_resource_url=create_resource_url,
-        ).execute(request.input, wait=ready)
+    @app.post("/runs")
+    async def create_run(
+        request: RunCreateRequest, req: Request, idempotency_key: Annotated[str | None, Header()] = None
+    ) -> RunCreateResponse:
+        run_id = uuid.uuid4()
+        if idempotency_key:
+            claimed_run_id = await claim_idempotency_key(idempotency_key, await req.body(), run_id=run_id)
+            if claimed_run_id != run_id:
+                return await replay_run(claimed_run_id, request.mode, req)
+        try:
+            run_data, ready = await prepare_run(request, req, run_id=run_id)
+        except Exception:
+            # The run was never created, a retry must be free to create it
+            if idempotency_key:
+                await idempotency_store.set(idempotency_key, None)
+            raise
+        headers = {Headers.RUN_ID: str(run_data.run.run_id)}
 
         match request.mode:
             case RunMode.STREAM:
-                return StreamingResponse(
-                    stream_sse(run_data, run_store, 0, ready=ready),
-                    headers=headers,
-                    media_type="text/event-stream",
+                mode = event_mode(req)
+                return sse_response(
+                    stream_sse(run_data, run_dispatcher, 0, ready=ready, mode=mode), mode=mode, headers=headers
                 )
             case RunMode.SYNC:
-                await wait_util_stop(run_data, run_store, ready=ready)
-                return JSONResponse(
-                    headers=headers,
-                    content=jsonable_encoder(run_data.run),
-                )
+                await wait_util_stop(run_data, run_dispatcher, ready=ready)
+                return ModelResponse(run_data.run, headers=headers)
             case RunMode.ASYNC:
                 ready.set()
-                return JSONResponse(
+                return ModelResponse(run_data.run, status_code=status.HTTP_202_ACCEPTED, headers=headers)
+            case _:
+                raise NotImplementedError()
+
+    @app.post("/runs/batch")
+    async def create_runs(request: RunBatchCreateRequest, req: Request) -> RunBatchCreateResponse:
+        if len(request.runs) > max_batch_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Batch of {len(request.runs)} runs exceeds the limit of {max_batch_size}",
+            )
+        prepared = await prepare_runs(request.runs, req)
+
+        match request.mode:
+            case RunMode.STREAM:
+                mode = event_mode(req)
+                return sse_response(stream_batch_sse(prepared, run_dispatcher, mode=mode), mode=mode)
+            case RunMode.SYNC:
+                runs_data = await asyncio.gather(
+                    *(wait_util_stop(run_data, run_dispatcher, ready=ready) for run_data, ready in prepared)
+                )
+                return ModelResponse(RunBatchCreateResponse(runs=[run_data.run for run_data in runs_data]))
+            case RunMode.ASYNC:
+                for _, ready in prepared:
+                    ready.set()
+                return ModelResponse(
+                    RunBatchCreateResponse(runs=[run_data.run for run_data, _ in prepared]),
                     status_code=status.HTTP_202_ACCEPTED,
-                    headers=headers,
-                    content=jsonable_encoder(run_data.run),
                 )
             case _:
                 raise NotImplementedError()
 
     @app.get("/runs/{run_id}")
-    async def read_run(run_id: RunId) -> RunReadResponse:
-        bundle = await find_run_data(run_id)
-        return bundle.run
+    async def read_run(
+        run_id: RunId,
+        req: Request,
+        wait: Annotated[float | None, Query(ge=0, le=300)] = None,
+        since_status: RunStatus | None = None,
+    ) -> RunReadResponse:
+        if not wait:
+            bundle = await find_run_data(run_id, req)
+            return ModelResponse(bundle.run)
+
+        # Long poll, the request is parked until the status differs from the one the client has seen
+        queue: asyncio.Queue[RunData | None] = asyncio.Queue()
+        unsubscribe = run_dispatcher.subscribe(run_id, queue.put_nowait)
+        try:
+            # Read after subscribing so that no change falls in between
+            run = (await find_run_data(run_id, req)).run
+            # Stored updates do not carry the overlay of a requested cancel, it is applied to them the same way
+            cancelling = run.status == RunStatus.CANCELLING
+            since_status = since_status or run.status
+            deadline = asyncio.get_running_loop().time() + wait
+            # Terminal runs do not change anymore, there is nothing to wait for
+            while run.status == since_status and not run.status.is_terminal:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    data = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if data is None:
+                    break
+                run = data.run
+                if cancelling and not run.status.is_terminal:
+                    run = run.model_copy(update={"status": RunStatus.CANCELLING})
+            return ModelResponse(run)
+        finally:
+            unsubscribe()
 
     @app.get("/runs/{run_id}/events")
-    async def list_run_events(run_id: RunId) -> RunEventsListResponse:
-        bundle = await find_run_data(run_id)
-        return RunEventsListResponse(events=bundle.events)
-
-    @app.post("/runs/{run_id}")
-    async def resume_run(run_id: RunId, request: RunResumeRequest) -> RunResumeResponse:
-        run_data = await find_run_data(run_id)
-
-        if run_data.run.await_request is None:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Run {run_id} has no await request")
+    async def list_run_events(
+        run_id: RunId,
+        req: Request,
+        after: Annotated[int | None, Query(ge=0)] = None,
+        limit: Annotated[int | None, Query(ge=1)] = None,
+        type: Annotated[list[str] | None, Query()] = None,
+    ) -> RunEventsListResponse:
+        events = await find_run_events(run_id, req)
+        mode = event_mode(req)
+        # Events are encoded while the response is written rather than validated into one response model
+        return StreamingResponse(
+            encode_events_page(
+                events,
+                after=after,
+                limit=limit,
+                types=set(type or ()),
+                mode=mode,
+                expanders=event_expanders.setdefault(run_id, {}),
+            ),
+            headers={Headers.EVENT_MODE: mode.value},
+            media_type="application/json",
+        )
 
-        if run_data.run.await_request.type != request.await_resume.type:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Run {run_id} is expecting resume of type {run_data.run.await_request.type}",
-            )
+    @app.get("/runs/{run_id}/stream")
+    async def stream_run(
+        run_id: RunId, req: Request, last_event_id: Annotated[int | None, Header()] = None
+    ) -> StreamingResponse:
+        run_data = await find_run_data(run_id, req)
+        idx = 0 if last_event_id is None else last_event_id + 1
+        mode = event_mode(req)
+        return sse_response(replay_sse(run_data, run_store, run_dispatcher, idx, mode=mode), mode=mode)
 
-        run_data.run.status = RunStatus.IN_PROGRESS
-        await run_store.set(run_data.key, run_data)
-        await run_resume_store.set(run_data.key, request.await_resume)
+    @app.post("/runs/{run_id}")
+    async def resume_run(run_id: RunId, request: RunResumeRequest, req: Request) -> RunResumeResponse:
+        run_data = await prepare_resume(run_id, request.await_resume, req)
 
         match request.mode:
             case RunMode.STREAM:
-                return StreamingResponse(
-                    stream_sse(run_data, run_store, len(run_data.events)),
-                    media_type="text/event-stream",
-                )
+                mode = event_mode(req)
+                return sse_response(stream_sse(run_data, run_dispatcher, len(run_data.events), mode=mode), mode=mode)
             case RunMode.SYNC:
-                run_data = await wait_util_stop(run_data, run_store)
-                return run_data.run
+                run_data = await wait_util_stop(run_data, run_dispatcher)
+                return ModelResponse(run_data.run)
             case RunMode.ASYNC:
-                return JSONResponse(
-                    status_code=status.HTTP_202_ACCEPTED,
-                    content=jsonable_encoder(run_data.run),
-                )
+                return ModelResponse(run_data.run, status_code=status.HTTP_202_ACCEPTED)
             case _:
                 raise NotImplementedError()
 
     @app.post("/runs/{run_id}/cancel")
-    async def cancel_run(run_id: RunId) -> RunCancelResponse:
-        run_data = await find_run_data(run_id)
-        if run_data.run.status.is_terminal:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Run in terminal status {run_data.run.status} can't be cancelled",
-            )
-        await run_cancel_store.set(run_data.key, CancelData())
-        run_data.run.status = RunStatus.CANCELLING
-        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=jsonable_encoder(run_data.run))
+    async def cancel_run(run_id: RunId, req: Request) -> RunCancelResponse:
+        run_data = await request_cancel(run_id, req)
+        return ModelResponse(run_data.run, status_code=status.HTTP_202_ACCEPTED)
+
+    socket_dependant = Dependant(
+        dependencies=[get_parameterless_sub_dependant(depends=depends, path="/ws") for depends in dependencies or []]
+    )
+
+    async def socket_dependencies(websocket: WebSocket) -> AsyncGenerator[None]:
+        """Resolves the app dependencies for the handshake, they commonly take a `Request` that websockets lack"""
+        request = Request({**websocket.scope, "type": "http", "method": "GET"})
+        async with AsyncExitStack() as stack:
+            try:
+                solved = await solve_dependencies(
+                    request=request,
+                    dependant=socket_dependant,
+                    dependency_overrides_provider=app,
+                    async_exit_stack=stack,
+                    embed_body_fields=False,
+                )
+            except HTTPException as e:
+                raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+            if solved.errors:
+                raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid handshake")
+            yield
+
+    async def run_socket(websocket: WebSocket) -> None:
+        """Multiplexes runs over one connection, runs are always streamed regardless of the requested mode"""
+        # CORS does not cover websockets, browsers connect from any page unless the origin is checked here
+        origin = websocket.headers.get("origin")
+        same_origin = origin is not None and httpx.URL(origin).netloc.decode() == websocket.headers.get("host")
+        if origin is not None and origin not in allowed_origins and not same_origin:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Origin not allowed")
+            return
+        mode = event_mode(websocket)
+        await websocket.accept(headers=[(Headers.EVENT_MODE.lower().encode(), mode.value.encode())])
+        send_lock = asyncio.Lock()
+        tasks: set[asyncio.Task] = set()
+
+        async def send(response: SocketEvent | SocketDone | SocketError) -> None:
+            async with send_lock:
+                await websocket.send_text(response.model_dump_json())
+
+        async def forward(ref: str, run_data: RunData, idx: int, *, ready: asyncio.Event | None = None) -> None:
+            async for _, event in stream_events(run_data, run_dispatcher, idx, ready=ready, mode=mode):
+                await send(SocketEvent(ref=ref, event=event))
+            run_data = await run_store.get(run_data.key) or run_data
+            await send(SocketDone(ref=ref, run=run_data.run))
+
+        async def handle(request: SocketRunCreateRequest | SocketRunResumeRequest | SocketRunCancelRequest) -> None:
+            try:
+                match request:
+                    case SocketRunCreateRequest():
+                        run_data, ready = await prepare_run(request.request, websocket)
+                        await forward(request.ref, run_data, 0, ready=ready)
+                    case SocketRunResumeRequest():
+                        run_data = await prepare_resume(request.run_id, request.await_resume, websocket)
+                        await forward(request.ref, run_data, len(run_data.events))
+                    case SocketRunCancelRequest():
+                        run_data = await request_cancel(request.run_id, websocket)
+                        await send(SocketDone(ref=request.ref, run=run_data.run))
+            except ACPError as e:
+                await send(SocketError(ref=request.ref, error=e.error))
+            except HTTPException as e:
+                error = Error(code=status_code_to_error_code(e.status_code), message=e.detail)
+                await send(SocketError(ref=request.ref, error=error))
+            except Exception as e:
+                logger.error(e)
+                error = Error(code=ErrorCode.SERVER_ERROR, message="An unexpected error occurred")
+                await send(SocketError(ref=request.ref, error=error))
+
+        try:
+            while True:
+                try:
+                    request = socket_request_adapter.validate_json(await websocket.receive_text())
+                except ValidationError as e:
+                    await send(SocketError(error=Error(code=ErrorCode.INVALID_INPUT, message=str(e))))
+                    continue
+                task = asyncio.create_task(handle(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Added without the app dependencies, `socket_dependencies` resolves them against the handshake instead
+    app.router.routes.append(
+        APIWebSocketRoute(
+            "/ws", run_socket, dependencies=[Depends(socket_dependencies)], dependency_overrides_provider=app
+        )
+    )
 
     @app.get("/sessions/{session_id}")
     async def read_session(session_id: SessionId) -> SessionReadResponse:
         session = await session_store.get(session_id)
         if not session:
             raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
-        return session
+        return ModelResponse(session)
 
     if forward_resources:
 
         @app.get("/resources/{resource_id}", name="get_resource")
-        async def read_resource(resource_id: ResourceId) -> StreamingResponse:
-            try:
-                result = await resource_store.load(resource_id)
-                return StreamingResponse(result)
-            except NotFoundError:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Resource {resource_id} not found")
+        async def read_resource(resource_id: ResourceId, req: Request) -> Response:
+            return await serve_resource(resource_store, resource_id, req)
 
     return app
@@ -1,7 +1,7 @@
 from concurrent.futures import ThreadPoolExecutor
 
 import janus
-from fastapi import Request
+from fastapi import Request, WebSocket
 
 from acp_sdk.models import Session
 from acp_sdk.server.types import RunYield, RunYieldResume
@@ -16,7 +16,7 @@ class Context:
         store: ResourceStore,
         loader: ResourceLoader,
         executor: ThreadPoolExecutor,
-        request: Request,
+        request: Request | WebSocket,
         yield_queue: janus.Queue[RunYield],
         yield_resume_queue: janus.Queue[RunYieldResume],
     ) -> None:
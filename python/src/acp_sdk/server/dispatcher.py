@@ -0,0 +1,193 @@
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from datetime import timedelta
+from types import TracebackType
+from typing import Generic, Self
+
+from acp_sdk.server.logging import logger
+from acp_sdk.server.store.store import Store, T
+from acp_sdk.server.store.utils import Stringable
+
+Callback = Callable[[T | None], None]
+
+
+class Dispatcher(Generic[T]):
+    """Routes changes in a store to local subscribers through a single watch per process
+
+    Stores that can't watch a prefix are watched key by key instead, one watch per subscribed key.
+    """
+
+    def __init__(
+        self,
+        store: Store[T],
+        *,
+        min_retry_delay: timedelta = timedelta(milliseconds=100),
+        max_retry_delay: timedelta = timedelta(seconds=5),
+    ) -> None:
+        self._store = store
+        self._min_retry_delay = min_retry_delay
+        self._max_retry_delay = max_retry_delay
+        self._subscribers: dict[str, set[Callback[T]]] = {}
+        # Keys being fetched, mapped to whether they changed again since the fetch started
+        self._fetching: dict[str, bool] = {}
+        self._fetches: set[asyncio.Task] = set()
+        self._task: asyncio.Task | None = None
+        # Watches of the subscribed keys, used when the store can't watch a prefix
+        self._key_watches: dict[str, asyncio.Task] | None = None
+        self.ready = asyncio.Event()
+
+    async def __aenter__(self) -> Self:
+        if self._store.can_watch_prefix:
+            self._task = asyncio.create_task(self._listen())
+        else:
+            self._key_watches = {}
+            for key in self._subscribers:
+                self._start_key_watch(key)
+            self.ready.set()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None = None,
+        exc_value: BaseException | None = None,
+        traceback: TracebackType | None = None,
+    ) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._key_watches is not None:
+            key_watches = list(self._key_watches.values())
+            self._key_watches = None
+            for task in key_watches:
+                task.cancel()
+            await asyncio.gather(*key_watches, return_exceptions=True)
+            self.ready.clear()
+        for task in self._fetches:
+            task.cancel()
+        await asyncio.gather(*self._fetches, return_exceptions=True)
+
+    def subscribe(self, key: Stringable, callback: Callback[T]) -> Callable[[], None]:
+        """Registers the callback for changes of the key, returns a function that unregisters it"""
+        key = str(key)
+        if key not in self._subscribers and self._key_watches is not None:
+            self._start_key_watch(key)
+        self._subscribers.setdefault(key, set()).add(callback)
+
+        def unsubscribe() -> None:
+            callbacks = self._subscribers.get(key)
+            if callbacks is None:
+                return
+            callbacks.discard(callback)
+            if not callbacks:
+                del self._subscribers[key]
+                if self._key_watches is not None and key in self._key_watches:
+                    self._key_watches.pop(key).cancel()
+
+        return unsubscribe
+
+    async def watch(self, key: Stringable, *, ready: asyncio.Event | None = None) -> AsyncIterator[T | None]:
+        """Same as `Store.watch` but served by the shared watch of the dispatcher"""
+        queue: asyncio.Queue[T | None] = asyncio.Queue()
+        unsubscribe = self.subscribe(key, queue.put_nowait)
+        try:
+            if ready:
+                ready.set()
+            while True:
+                yield await queue.get()
+        finally:
+            unsubscribe()
+
+    def _dispatch(self, key: str, value: T | None) -> None:
+        for callback in list(self._subscribers.get(key, ())):
+            try:
+                callback(value)
+            except Exception:
+                logger.exception("Dispatcher callback failed")
+
+    def _fetch(self, key: str) -> None:
+        # Keys are fetched concurrently, a key changing during its fetch is fetched once more afterwards
+        if key in self._fetching:
+            self._fetching[key] = True
+            return
+        self._fetching[key] = False
+        task = asyncio.create_task(self._fetch_latest(key))
+        self._fetches.add(task)
+        task.add_done_callback(self._fetches.discard)
+
+    async def _fetch_latest(self, key: str) -> None:
+        try:
+            while True:
+                self._dispatch(key, await self._store.get(key))
+                if not self._fetching[key]:
+                    break
+                self._fetching[key] = False
+        except Exception:
+            logger.warning(f"Dispatcher failed to fetch {key}", exc_info=True)
+        finally:
+            del self._fetching[key]
+
+    async def _listen(self) -> None:
+        delay = self._min_retry_delay
+        while True:
+            ready = asyncio.Event()
+            catch_up = asyncio.create_task(self._catch_up(ready))
+            try:
+                async for key in self._store.watch_prefix(ready=ready):
+                    delay = self._min_retry_delay
+                    if key in self._subscribers:
+                        self._fetch(key)
+            except Exception:
+                logger.warning(f"Store watch failed, restarting in {delay.total_seconds()}s", exc_info=True)
+            finally:
+                catch_up.cancel()
+                self.ready.clear()
+            await asyncio.sleep(delay.total_seconds())
+            delay = min(delay * 2, self._max_retry_delay)
+
+    async def _catch_up(self, ready: asyncio.Event) -> None:
+        # Changes made while the watch was not established would be lost otherwise
+        await ready.wait()
+        self.ready.set()
+        try:
+            for key in list(self._subscribers):
+                value = await self._store.get(key)
+                if value is not None:
+                    self._dispatch(key, value)
+        except Exception:
+            logger.warning("Dispatcher catch up failed", exc_info=True)
+
+    def _start_key_watch(self, key: str) -> None:
+        self._key_watches[key] = asyncio.create_task(self._watch_key(key))
+
+    async def _watch_key(self, key: str) -> None:
+        delay = self._min_retry_delay
+        exists = False
+
+        def dispatch(value: T | None) -> None:
+            # Some stores yield on changes of any key, a key without a value is dispatched only once it is deleted
+            nonlocal exists
+            if value is not None or exists:
+                exists = value is not None
+                self._dispatch(key, value)
+
+        while True:
+            ready = asyncio.Event()
+            catch_up = asyncio.create_task(self._catch_up_key(key, ready, dispatch))
+            try:
+                async for value in self._store.watch(key, ready=ready):
+                    delay = self._min_retry_delay
+                    dispatch(value)
+            except Exception:
+                logger.warning(f"Store watch of {key} failed, restarting in {delay.total_seconds()}s", exc_info=True)
+            finally:
+                catch_up.cancel()
+            await asyncio.sleep(delay.total_seconds())
+            delay = min(delay * 2, self._max_retry_delay)
+
+    async def _catch_up_key(self, key: str, ready: asyncio.Event, dispatch: Callback[T]) -> None:
+        await ready.wait()
+        try:
+            dispatch(await self._store.get(key))
+        except Exception:
+            logger.warning(f"Dispatcher catch up of {key} failed", exc_info=True)
@@ -1,11 +1,11 @@
 from fastapi import Request, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from acp_sdk.models import Error, ErrorCode
 from acp_sdk.models.errors import ACPError
 from acp_sdk.server.logging import logger
+from acp_sdk.server.responses import ModelResponse
 
 
 def error_code_to_status_code(error_code: ErrorCode) -> int:
@@ -24,32 +24,37 @@ def status_code_to_error_code(status_code: int) -> ErrorCode:
             return ErrorCode.INVALID_INPUT
         case status.HTTP_404_NOT_FOUND:
             return ErrorCode.NOT_FOUND
+        case status.HTTP_413_REQUEST_ENTITY_TOO_LARGE:
+            return ErrorCode.INVALID_INPUT
+        case status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE:
+            return ErrorCode.INVALID_INPUT
         case status.HTTP_422_UNPROCESSABLE_ENTITY:
             return ErrorCode.INVALID_INPUT
         case _:
             return ErrorCode.SERVER_ERROR
 
 
-async def acp_error_handler(request: Request, exc: ACPError, *, status_code: int | None = None) -> JSONResponse:
+async def acp_error_handler(
+    request: Request, exc: ACPError, *, status_code: int | None = None, headers: dict[str, str] | None = None
+) -> ModelResponse:
     error = exc.error
-    return JSONResponse(
-        status_code=status_code or error_code_to_status_code(error.code), content=error.model_dump(mode="json")
-    )
+    return ModelResponse(error, status_code=status_code or error_code_to_status_code(error.code), headers=headers)
 
 
-async def http_exception_handler(request: Request, exc: StarletteHTTPException) -> JSONResponse:
+async def http_exception_handler(request: Request, exc: StarletteHTTPException) -> ModelResponse:
     return await acp_error_handler(
         request,
         ACPError(Error(code=status_code_to_error_code(exc.status_code), message=exc.detail)),
         status_code=exc.status_code,
+        headers=exc.headers,
     )
 
 
-async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
+async def validation_exception_handler(request: Request, exc: RequestValidationError) -> ModelResponse:
     return await acp_error_handler(request, ACPError(Error(code=ErrorCode.INVALID_INPUT, message=str(exc))))
 
 
-async def catch_all_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+async def catch_all_exception_handler(request: Request, exc: Exception) -> ModelResponse:
     logger.error(exc)
     return await acp_error_handler(
         request, ACPError(Error(code=ErrorCode.SERVER_ERROR, message="An unexpected error occurred"))
@@ -1,14 +1,14 @@
 import asyncio
 import inspect
 import logging
-import uuid
+import weakref
 from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Generator
 from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime, timezone
-from typing import Callable, Self
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Self
 
 import janus
-from fastapi import Request
+from fastapi import Request, WebSocket
 from pydantic import BaseModel, ValidationError
 
 from acp_sdk.instrumentation import get_tracer
@@ -21,6 +21,7 @@ from acp_sdk.models import (
     ErrorCode,
     Event,
     GenericEvent,
+    HistorySegment,
     Message,
     MessageCompletedEvent,
     MessageCreatedEvent,
@@ -34,28 +35,43 @@ from acp_sdk.models import (
     RunCompletedEvent,
     RunCreatedEvent,
     RunFailedEvent,
+    RunId,
     RunInProgressEvent,
     RunStatus,
     Session,
+    SessionId,
+    compact_event,
 )
 from acp_sdk.server.agent import Agent
 from acp_sdk.server.context import Context
+from acp_sdk.server.dispatcher import Dispatcher
 from acp_sdk.server.logging import logger
+from acp_sdk.server.recovery import LeaseKeeper
+from acp_sdk.server.resources import LocalResourceLoader
 from acp_sdk.server.store import Store
 from acp_sdk.server.types import RunYield, RunYieldResume
 from acp_sdk.shared import ResourceLoader, ResourceStore
 
+# Number of trailing segments below the segment size that are merged together
+SEGMENT_COMPACTION_THRESHOLD = 16
+
+# Serializes session writes within the process, held only while some run records the session
+_session_locks: weakref.WeakValueDictionary[SessionId, asyncio.Lock] = weakref.WeakValueDictionary()
+
 
 class RunData(BaseModel):
     run: Run
     events: list[Event] = []
+    input: list[Message] | None = None
+    deadline: datetime | None = None
+    await_timeout: timedelta | None = None
 
     @property
     def key(self) -> str:
         return str(self.run.run_id)
 
-    async def watch(self, store: Store[Self], *, ready: asyncio.Event | None = None) -> AsyncIterator[Self]:
-        async for data in store.watch(self.key, ready=ready):
+    async def watch(self, dispatcher: Dispatcher[Self], *, ready: asyncio.Event | None = None) -> AsyncIterator[Self]:
+        async for data in dispatcher.watch(self.key, ready=ready):
             if data is None:
                 raise RuntimeError("Missing data")
             yield data
@@ -63,10 +79,27 @@ class RunData(BaseModel):
                 break
 
 
+class RunEventsData(BaseModel):
+    """Stored run data with the events left unvalidated, so that a page of them is validated alone"""
+
+    run: Run
+    events: list[Any] = []
+
+
 class CancelData(BaseModel):
     pass
 
 
+class IdempotencyData(BaseModel):
+    run_id: RunId
+    request_hash: str
+    expires_at: datetime
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expires_at < datetime.now(timezone.utc)
+
+
 class Executor:
     def __init__(
         self,
@@ -75,14 +108,21 @@ class Executor:
         run_data: RunData,
         session: Session,
         executor: ThreadPoolExecutor,
-        request: Request,
+        request: Request | WebSocket,
         run_store: Store[RunData],
-        cancel_store: Store[CancelData],
+        cancel_dispatcher: Dispatcher[CancelData],
         resume_store: Store[AwaitResume],
+        resume_dispatcher: Dispatcher[AwaitResume],
         session_store: Store[Session],
         resource_store: ResourceStore,
         resource_loader: ResourceLoader,
         create_resource_url: Callable[[ResourceId], Awaitable[ResourceUrl]],
+        lease_keeper: LeaseKeeper,
+        timeout: timedelta | None = None,
+        await_timeout: timedelta | None = None,
+        defer_session_recording: bool = False,
+        session_segment_size: int = 1024 * 1024,
+        coalesce_parts: bool = False,
     ) -> None:
         self.agent = agent
         self.session = session
@@ -91,50 +131,140 @@ class Executor:
         self.request = request
 
         self.run_store = run_store
-        self.cancel_store = cancel_store
+        self.cancel_dispatcher = cancel_dispatcher
         self.resume_store = resume_store
+        self.resume_dispatcher = resume_dispatcher
         self.session_store = session_store
         self.resource_store = resource_store
         self.resource_loader = resource_loader
 
         self.create_resource_url = create_resource_url
+        self.lease_keeper = lease_keeper
+        self.timeout = timeout
+        self.await_timeout = await_timeout
+        self.defer_session_recording = defer_session_recording
+        self.session_segment_size = session_segment_size
+        self.coalesce_parts = coalesce_parts
+        self.cancelling = False
+        self.timed_out = False
 
         self.logger = logging.LoggerAdapter(logger, {"run_id": str(run_data.run.run_id)})
 
     def execute(self, input: list[Message], *, wait: asyncio.Event) -> None:
         self.task = asyncio.create_task(self._execute(input=input, executor=self.executor, wait=wait))
-        self.watcher = asyncio.create_task(self._watch_for_cancellation())
+        unsubscribe = self.cancel_dispatcher.subscribe(self.run_data.key, self._on_cancel)
+        self.task.add_done_callback(lambda _: unsubscribe())
+        if self.timeout is not None:
+            timer = asyncio.get_running_loop().call_later(self.timeout.total_seconds(), self._on_timeout)
+            self.task.add_done_callback(lambda _: timer.cancel())
 
     async def _push(self) -> None:
         await self.run_store.set(self.run_data.run.run_id, self.run_data)
 
     async def _emit(self, event: Event) -> None:
-        freeze = event.model_copy(deep=True)
+        # Status events are stored compact, the output is rebuilt from the message events when read
+        freeze = compact_event(event).model_copy(deep=True)
         self.run_data.events.append(freeze)
         await self._push()
 
     async def _await(self) -> AwaitResume:
-        async for resume in self.resume_store.watch(self.run_data.key):
-            if resume is not None:
-                await self.resume_store.set(self.run_data.key, None)
-                return resume
+        # The awaiting run holds no watch of its own, the resume is delivered by the shared dispatcher
+        resumed: asyncio.Future[AwaitResume] = asyncio.get_running_loop().create_future()
 
-    async def _watch_for_cancellation(self) -> None:
-        while not self.task.done():
-            try:
-                async for data in self.cancel_store.watch(self.run_data.key):
-                    if data is not None:
-                        self.task.cancel()
-            except Exception:
-                logger.warning("Cancellation watcher failed, restarting")
+        def on_resume(resume: AwaitResume | None) -> None:
+            if resume is not None and not resumed.done():
+                resumed.set_result(resume)
+
+        unsubscribe = self.resume_dispatcher.subscribe(self.run_data.key, on_resume)
+        try:
+            # The resume could have been stored before the subscription
+            on_resume(await self.resume_store.get(self.run_data.key))
+            async with asyncio.timeout(self.await_timeout.total_seconds() if self.await_timeout else None):
+                resume = await resumed
+            await self.resume_store.set(self.run_data.key, None)
+            return resume
+        except TimeoutError:
+            raise ACPError(
+                Error(
+                    code=ErrorCode.SERVER_ERROR,
+                    message=f"Run was not resumed within {self.await_timeout.total_seconds()} seconds",
+                )
+            )
+        finally:
+            unsubscribe()
+
+    def _on_cancel(self, data: CancelData | None) -> None:
+        if data is not None and not self.cancelling and not self.timed_out:
+            self.cancelling = True
+            self.task.cancel()
+
+    def _on_timeout(self) -> None:
+        if not self.cancelling and not self.timed_out:
+            self.timed_out = True
+            self.task.cancel()
 
     async def _record_session(self, history: list[Message]) -> None:
-        for message in history:
-            id = uuid.uuid4()
-            url = await self.create_resource_url(id)
-            await self.resource_store.store(id, message.model_dump_json().encode())
-            self.session.history.append(url)
-        await self.session_store.set(self.session.id, self.session)
+        data, offsets = HistorySegment.encode(history)
+        id = await self.resource_store.store_content(data)
+        segment = HistorySegment(url=await self.create_resource_url(id), offsets=offsets)
+        lock = _session_locks.setdefault(self.session.id, asyncio.Lock())
+        async with lock:
+            # Other runs of the session may have recorded since this one started, only this run's segment is added
+            stored = await self.session_store.get(self.session.id)
+            if stored is not None:
+                self.session.history = stored.history
+                self.session.segments = stored.segments
+            self.session.segments = await self._compact_segments([*self.session.segments, segment])
+            await self.session_store.set(self.session.id, self.session)
+
+    async def _compact_segments(self, segments: list[HistorySegment]) -> list[HistorySegment]:
+        """Merges trailing small segments once enough of them pile up, keeping their count bounded"""
+        count = 0
+        for segment in reversed(segments):
+            if segment.offsets[-1] >= self.session_segment_size:
+                break
+            count += 1
+        if count < SEGMENT_COMPACTION_THRESHOLD:
+            return segments
+
+        groups: list[list[HistorySegment]] = [[]]
+        for segment in segments[-count:]:
+            if groups[-1] and sum(s.offsets[-1] for s in groups[-1]) + segment.offsets[-1] > self.session_segment_size:
+                groups.append([])
+            groups[-1].append(segment)
+
+        compacted: list[HistorySegment] = []
+        replaced: list[HistorySegment] = []
+        for group in groups:
+            if len(group) == 1:
+                compacted.extend(group)
+                continue
+            data = b"".join(await asyncio.gather(*(self.resource_loader.load(segment.url) for segment in group)))
+            offsets = [0]
+            for segment in group:
+                base = offsets[-1]
+                offsets.extend(offset + base for offset in segment.offsets[1:])
+            id = await self.resource_store.store_content(data)
+            compacted.append(HistorySegment(url=await self.create_resource_url(id), offsets=offsets))
+            replaced.extend(group)
+        await self._delete_segments(replaced)
+        return [*segments[:-count], *compacted]
+
+    async def _delete_segments(self, segments: list[HistorySegment]) -> None:
+        # Content addressed objects may be shared with other sessions, objects not served by this server are unknown
+        if self.resource_store.content_addressed or not isinstance(self.resource_loader, LocalResourceLoader):
+            return
+        ids = [id for id in (self.resource_loader.resolve(segment.url) for segment in segments) if id is not None]
+        results = await asyncio.gather(*map(self.resource_store.delete, ids), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                self.logger.warning(f"Failed to delete compacted segment: {result}")
+
+    async def _try_record_session(self, history: list[Message]) -> None:
+        try:
+            await self._record_session(history)
+        except Exception as e:
+            self.logger.warning(f"Failed to record session: {e}")
 
     async def _execute(self, input: list[Message], *, executor: ThreadPoolExecutor, wait: asyncio.Event) -> None:
         run_data = self.run_data
@@ -145,12 +275,16 @@ class Executor:
                 nonlocal in_message
                 if in_message:
                     message = run_data.run.output[-1]
+                    if self.coalesce_parts:
+                        # Joined once per message, every part was still streamed as its own event
+                        message.parts = message.compress().parts
                     message.completed_at = datetime.now(timezone.utc)
                     await self._emit(MessageCompletedEvent(message=message))
                     session_history.append(message)
                     in_message = False
 
             session_history = input.copy()
+            generator = None
             try:
                 await wait.wait()
 
@@ -186,12 +320,13 @@ class Executor:
                         await self._emit(MessagePartEvent(part=next))
                     elif isinstance(next, Message):
                         await flush_message()
-                        run_data.run.output.append(next.model_copy(update={"role": f"agent/{self.agent.name}"}))
-                        await self._emit(MessageCreatedEvent(message=next))
-                        for part in next.parts:
+                        message = next.model_copy(update={"role": f"agent/{self.agent.name}"})
+                        run_data.run.output.append(message)
+                        await self._emit(MessageCreatedEvent(message=message))
+                        for part in message.parts:
                             await self._emit(MessagePartEvent(part=part))
-                        await self._emit(MessageCompletedEvent(message=next))
-                        session_history.append(next)
+                        await self._emit(MessageCompletedEvent(message=message))
+                        session_history.append(message)
                     elif isinstance(next, AwaitRequest):
                         run_data.run.await_request = next
                         run_data.run.status = RunStatus.AWAITING
@@ -219,17 +354,27 @@ class Executor:
                 await flush_message()
                 run_data.run.status = RunStatus.COMPLETED
                 run_data.run.finished_at = datetime.now(timezone.utc)
-                try:
-                    await self._record_session(session_history)
-                except Exception as e:
-                    self.logger.warning(f"Failed to record session: {e}")
+                if not self.defer_session_recording:
+                    await self._try_record_session(session_history)
                 await self._emit(RunCompletedEvent(run=run_data.run))
                 self.logger.info("Run completed")
+                if self.defer_session_recording:
+                    await self._try_record_session(session_history)
             except asyncio.CancelledError:
-                run_data.run.status = RunStatus.CANCELLED
-                run_data.run.finished_at = datetime.now(timezone.utc)
-                await self._emit(RunCancelledEvent(run=run_data.run))
-                self.logger.info("Run cancelled")
+                if self.timed_out:
+                    run_data.run.error = Error(
+                        code=ErrorCode.SERVER_ERROR,
+                        message=f"Run exceeded its timeout of {self.timeout.total_seconds()} seconds",
+                    )
+                    run_data.run.status = RunStatus.FAILED
+                    run_data.run.finished_at = datetime.now(timezone.utc)
+                    await self._emit(RunFailedEvent(run=run_data.run))
+                    self.logger.info("Run timed out")
+                else:
+                    run_data.run.status = RunStatus.CANCELLED
+                    run_data.run.finished_at = datetime.now(timezone.utc)
+                    await self._emit(RunCancelledEvent(run=run_data.run))
+                    self.logger.info("Run cancelled")
             except Exception as e:
                 if isinstance(e, ACPError):
                     run_data.run.error = e.error
@@ -239,6 +384,13 @@ class Executor:
                 run_data.run.finished_at = datetime.now(timezone.utc)
                 await self._emit(RunFailedEvent(run=run_data.run))
                 self.logger.exception("Run failed")
+            finally:
+                if generator is not None:
+                    await generator.aclose()
+                try:
+                    await self.lease_keeper.release(run_data.key)
+                except Exception as e:
+                    self.logger.warning(f"Failed to release lease: {e}")
 
     async def _execute_agent(
         self,
@@ -247,7 +399,7 @@ class Executor:
         storage: ResourceStore,
         loader: ResourceLoader,
         executor: ThreadPoolExecutor,
-        request: Request,
+        request: Request | WebSocket,
     ) -> AsyncGenerator[RunYield, RunYieldResume]:
         yield_queue: janus.Queue[RunYield] = janus.Queue()
         yield_resume_queue: janus.Queue[RunYieldResume] = janus.Queue()
@@ -279,6 +431,11 @@ class Executor:
                 await yield_resume_queue.async_q.put(value)
         except janus.AsyncQueueShutDown:
             pass
+        finally:
+            # Unblocks the agent if the run ends before the agent does, e.g. on timeout or cancellation
+            context.shutdown()
+            run.cancel()
+            run.add_done_callback(lambda run: run.cancelled() or run.exception())
 
     async def _run_async_gen(self, input: list[Message], context: Context) -> None:
         try:
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from types import TracebackType
+from typing import Self
+
+from pydantic import BaseModel
+
+from acp_sdk.server.logging import logger
+from acp_sdk.server.store import Store
+from acp_sdk.server.store.utils import Stringable
+
+
+class RecoveryPolicy(str, Enum):
+    """What happens to a run whose worker stopped renewing its lease"""
+
+    FAIL = "fail"
+    RESTART = "restart"
+
+
+class Lease(BaseModel):
+    worker_id: str
+    expires_at: datetime
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expires_at < datetime.now(timezone.utc)
+
+
+class LeaseKeeper:
+    """Holds leases of runs executed by this worker, renewing all of them from a single heartbeat task"""
+
+    def __init__(self, store: Store[Lease], *, worker_id: str, ttl: timedelta = timedelta(seconds=30)) -> None:
+        self._store = store
+        self._ttl = ttl
+        self._keys: set[str] = set()
+        self._task: asyncio.Task | None = None
+        self.worker_id = worker_id
+
+    async def __aenter__(self) -> Self:
+        self._task = asyncio.create_task(self._heartbeat())
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None = None,
+        exc_value: BaseException | None = None,
+        traceback: TracebackType | None = None,
+    ) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def acquire(self, key: Stringable) -> bool:
+        """Takes over the lease of the key, returns False if another worker holds a valid one"""
+        lease = await self._store.get(key)
+        if lease is not None and lease.worker_id != self.worker_id and not lease.is_expired:
+            return False
+        await self._store.set(key, self._create_lease())
+        # Best effort protection against another worker acquiring the same lease concurrently
+        lease = await self._store.get(key)
+        if lease is None or lease.worker_id != self.worker_id:
+            return False
+        self._keys.add(str(key))
+        return True
+
+    async def claim(self, keys: list[Stringable]) -> None:
+        """Takes over leases of keys no other worker can hold yet, such as ids of runs just created"""
+        await self._store.set_many({key: self._create_lease() for key in keys})
+        self._keys.update(str(key) for key in keys)
+
+    async def release(self, key: Stringable) -> None:
+        self._keys.discard(str(key))
+        await self._store.set(key, None)
+
+    async def is_abandoned(self, key: Stringable, *, since: datetime) -> bool:
+        """Whether the run has no live lease, runs younger than the lease TTL are given time to acquire one"""
+        if str(key) in self._keys:
+            return False
+        lease = await self._store.get(key)
+        if lease is None:
+            return since + self._ttl < datetime.now(timezone.utc)
+        return lease.is_expired
+
+    def _create_lease(self) -> Lease:
+        return Lease(worker_id=self.worker_id, expires_at=datetime.now(timezone.utc) + self._ttl)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self._ttl.total_seconds() / 3)
+            keys = list(self._keys)
+            if not keys:
+                continue
+            try:
+                lease = self._create_lease()
+                await self._store.set_many(dict.fromkeys(keys, lease))
+                # Runs finished during the write must not keep a renewed lease
+                released = [key for key in keys if key not in self._keys]
+                if released:
+                    await self._store.set_many(dict.fromkeys(released))
+            except Exception:
+                logger.warning(f"Failed to renew {len(keys)} leases", exc_info=True)
@@ -0,0 +1,152 @@
+import re
+import uuid
+from collections.abc import AsyncIterator
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+
+import httpx
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from obstore.exceptions import NotFoundError
+
+from acp_sdk.models import ResourceId, ResourceUrl
+from acp_sdk.shared import ResourceCache, ResourceLoader, ResourceStore
+
+
+class LocalResourceLoader(ResourceLoader):
+    """Reads resources forwarded by this server directly from its store instead of over HTTP"""
+
+    def __init__(
+        self, *, store: ResourceStore, client: httpx.AsyncClient | None = None, cache: ResourceCache | None = None
+    ) -> None:
+        super().__init__(client=client, cache=cache)
+        self._store = store
+        self._prefixes: set[str] = set()
+
+    def register(self, id: ResourceId, url: ResourceUrl) -> None:
+        """Records the URL prefix under which this server forwards its resources"""
+        self._prefixes.add(str(url).removesuffix(str(id)))
+
+    async def _fetch(self, url: ResourceUrl) -> bytes:
+        id = self.resolve(url)
+        if id is not None:
+            try:
+                result = await self._store.load(id)
+                return bytes(await result.bytes_async())
+            except (NotFoundError, FileNotFoundError):
+                # Another server could be forwarding under the same prefix, e.g. behind a load balancer
+                pass
+        return await super()._fetch(url)
+
+    async def _fetch_range(self, url: ResourceUrl, range: tuple[int, int]) -> bytes:
+        id = self.resolve(url)
+        if id is not None:
+            try:
+                result = await self._store.load(id, range=range)
+                return bytes(await result.bytes_async())
+            except (NotFoundError, FileNotFoundError):
+                pass
+        return await super()._fetch_range(url, range)
+
+    async def load_stream(self, url: ResourceUrl) -> AsyncIterator[bytes]:
+        id = self.resolve(url)
+        if id is not None:
+            try:
+                result = await self._store.load(id)
+            except (NotFoundError, FileNotFoundError):
+                result = None
+            if result is not None:
+                async for chunk in result.stream():
+                    yield bytes(chunk)
+                return
+        async for chunk in super().load_stream(url):
+            yield chunk
+
+    def resolve(self, url: ResourceUrl) -> ResourceId | None:
+        """Id of the resource if the URL is one this server forwards its resources under"""
+        url = str(url)
+        for prefix in self._prefixes:
+            if url.startswith(prefix):
+                try:
+                    return uuid.UUID(url.removeprefix(prefix))
+                except ValueError:
+                    continue
+        return None
+
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(value: str, size: int) -> tuple[int, int] | None:
+    """Parses a single byte range into a half-open interval, returns None if the header should be ignored"""
+    match = RANGE_PATTERN.match(value.strip())
+    if not match or not any(match.groups()):
+        # Malformed and multi-range requests are served in full
+        return None
+    first, last = match.groups()
+    if first and last and int(last) < int(first):
+        # Syntactically invalid ranges are ignored rather than unsatisfiable
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size
+    else:
+        start, end = int(first), min(int(last) + 1, size) if last else size
+    if start >= size or start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+def is_not_modified(request: Request, etag: str | None, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or (etag is not None and etag in tags)
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since is not None:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def serve_resource(store: ResourceStore, id: ResourceId, request: Request) -> Response:
+    """Serves the resource honoring range and conditional requests"""
+    try:
+        meta = await store.head(id)
+    except (NotFoundError, FileNotFoundError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Resource {id} not found")
+
+    size: int = meta["size"]
+    etag = meta.get("e_tag")
+    # Cloud stores return the tag quoted already, others give the bare value
+    if etag and not etag.startswith(('"', 'W/"')):
+        etag = f'"{etag}"'
+    headers = {"Accept-Ranges": "bytes", "Last-Modified": format_datetime(meta["last_modified"], usegmt=True)}
+    if etag:
+        headers["ETag"] = etag
+
+    if is_not_modified(request, etag, meta["last_modified"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    range = None
+    if "Range" in request.headers and request.headers.get("If-Range", etag) == etag:
+        range = parse_range(request.headers["Range"], size)
+
+    try:
+        result = await store.load(id, range=range)
+    except (NotFoundError, FileNotFoundError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Resource {id} not found")
+
+    media_type = result.attributes.get("content-type", "application/octet-stream")
+    if range:
+        start, end = range
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+        headers["Content-Length"] = str(end - start)
+        return StreamingResponse(
+            result, status_code=status.HTTP_206_PARTIAL_CONTENT, headers=headers, media_type=media_type
+        )
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(result, headers=headers, media_type=media_type)
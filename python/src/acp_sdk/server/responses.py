@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.responses import Response
+
+
+class ModelResponse(Response):
+    """JSON response serializing the model to bytes in one pass, without `jsonable_encoder` or re-validation"""
+
+    media_type = "application/json"
+
+    def render(self, content: BaseModel) -> bytes:
+        return to_json(content)
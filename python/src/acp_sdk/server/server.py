@@ -3,6 +3,7 @@ import os
 import re
 from collections.abc import AsyncGenerator, Awaitable
 from contextlib import asynccontextmanager
+from datetime import timedelta
 from typing import Any, Callable
 
 import requests
@@ -16,8 +17,10 @@ from acp_sdk.server.agent import agent as agent_decorator
 from acp_sdk.server.app import create_app
 from acp_sdk.server.logging import configure_logger as configure_logger_func
 from acp_sdk.server.logging import logger
+from acp_sdk.server.recovery import RecoveryPolicy
 from acp_sdk.server.store import Store
 from acp_sdk.server.telemetry import configure_telemetry as configure_telemetry_func
+from acp_sdk.server.thread_pool import ThreadPoolConfig
 from acp_sdk.server.utils import async_request_with_retry
 from acp_sdk.shared.resources import ResourceLoader, ResourceStore
 
@@ -33,11 +36,23 @@ class Server:
         description: str | None = None,
         *,
         metadata: Metadata | None = None,
+        thread_pool: ThreadPoolConfig | None = None,
+        timeout: timedelta | None = None,
+        await_timeout: timedelta | None = None,
+        recovery_policy: RecoveryPolicy = RecoveryPolicy.FAIL,
     ) -> Callable:
         """Decorator to register an agent."""
 
         def decorator(fn: Callable) -> Callable:
-            agent = agent_decorator(name=name, description=description, metadata=metadata)(fn)
+            agent = agent_decorator(
+                name=name,
+                description=description,
+                metadata=metadata,
+                thread_pool=thread_pool,
+                timeout=timeout,
+                await_timeout=await_timeout,
+                recovery_policy=recovery_policy,
+            )(fn)
             self.register(agent)
             return fn
 
@@ -59,6 +74,16 @@ class Server:
         store: Store | None = None,
         resource_store: ResourceStore | None = None,
         resource_loader: ResourceLoader | None = None,
+        thread_pool: ThreadPoolConfig | None = None,
+        lease_ttl: timedelta = timedelta(seconds=30),
+        defer_session_recording: bool = False,
+        session_segment_size: int = 1024 * 1024,
+        coalesce_parts: bool = False,
+        sse_keep_alive: timedelta | None = timedelta(seconds=15),
+        sse_batch_window: timedelta | None = None,
+        idempotency_ttl: timedelta = timedelta(hours=24),
+        max_batch_size: int = 100,
+        compression: bool = False,
         host: str = "127.0.0.1",
         port: int = 8000,
         uds: str | None = None,
@@ -127,6 +152,16 @@ class Server:
             store=store,
             resource_loader=resource_loader,
             resource_store=resource_store,
+            thread_pool=thread_pool,
+            lease_ttl=lease_ttl,
+            defer_session_recording=defer_session_recording,
+            session_segment_size=session_segment_size,
+            coalesce_parts=coalesce_parts,
+            sse_keep_alive=sse_keep_alive,
+            sse_batch_window=sse_batch_window,
+            idempotency_ttl=idempotency_ttl,
+            max_batch_size=max_batch_size,
+            compression=compression,
         )
 
         if configure_logger:
@@ -196,6 +231,16 @@ class Server:
         store: Store | None = None,
         resource_store: ResourceStore | None = None,
         resource_loader: ResourceLoader | None = None,
+        thread_pool: ThreadPoolConfig | None = None,
+        lease_ttl: timedelta = timedelta(seconds=30),
+        defer_session_recording: bool = False,
+        session_segment_size: int = 1024 * 1024,
+        coalesce_parts: bool = False,
+        sse_keep_alive: timedelta | None = timedelta(seconds=15),
+        sse_batch_window: timedelta | None = None,
+        idempotency_ttl: timedelta = timedelta(hours=24),
+        max_batch_size: int = 100,
+        compression: bool = False,
         host: str = "127.0.0.1",
         port: int = 8000,
         uds: str | None = None,
@@ -256,6 +301,16 @@ class Server:
                 store=store,
                 resource_store=resource_store,
                 resource_loader=resource_loader,
+                thread_pool=thread_pool,
+                lease_ttl=lease_ttl,
+                defer_session_recording=defer_session_recording,
+                session_segment_size=session_segment_size,
+                coalesce_parts=coalesce_parts,
+                sse_keep_alive=sse_keep_alive,
+                sse_batch_window=sse_batch_window,
+                idempotency_ttl=idempotency_ttl,
+                max_batch_size=max_batch_size,
+                compression=compression,
                 host=host,
                 port=port,
                 uds=uds,
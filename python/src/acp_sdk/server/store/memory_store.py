@@ -14,6 +14,7 @@ class MemoryStore(Store[T], Generic[T]):
         super().__init__()
         self._cache: TTLCache[str, str] = TTLCache(maxsize=limit, ttl=ttl, timer=datetime.now)
         self._event = asyncio.Event()
+        self._subscribers: set[asyncio.Queue[str]] = set()
 
     async def get(self, key: Stringable) -> T | None:
         value = self._cache.get(str(key))
@@ -21,10 +22,12 @@ class MemoryStore(Store[T], Generic[T]):
 
     async def set(self, key: Stringable, value: T | None) -> None:
         if value is None:
-            del self._cache[str(key)]
+            self._cache.pop(str(key), None)
         else:
             self._cache[str(key)] = value.model_dump_json()
         self._event.set()
+        for queue in self._subscribers:
+            queue.put_nowait(str(key))
 
     async def watch(self, key: Stringable, *, ready: asyncio.Event | None = None) -> AsyncIterator[T | None]:
         if ready:
@@ -33,3 +36,16 @@ class MemoryStore(Store[T], Generic[T]):
             await self._event.wait()
             self._event.clear()
             yield await self.get(key)
+
+    async def watch_prefix(self, prefix: Stringable = "", *, ready: asyncio.Event | None = None) -> AsyncIterator[str]:
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        self._subscribers.add(queue)
+        try:
+            if ready:
+                ready.set()
+            while True:
+                key = await queue.get()
+                if key.startswith(str(prefix)):
+                    yield key
+        finally:
+            self._subscribers.discard(queue)
@@ -1,5 +1,5 @@
 import asyncio
-from collections.abc import AsyncIterator
+from collections.abc import AsyncIterator, Mapping
 from typing import Generic
 
 from psycopg import AsyncConnection
@@ -15,35 +15,51 @@ class PostgreSQLStore(Store[T], Generic[T]):
         self._aconn = aconn
         self._table = table
         self._channel = channel
+        # The connection is shared, statements of other calls must not land in the transaction of a write
+        self._lock = asyncio.Lock()
 
     async def get(self, key: Stringable) -> T | None:
-        await self._ensure_table()
-        async with self._aconn.cursor(row_factory=dict_row) as cur:
-            await cur.execute(f"SELECT value FROM {self._table} WHERE key = %s", (str(key),))
-            result = await cur.fetchone()
-            if result is None:
-                return None
-            return StoreModel.model_validate(result["value"])
+        async with self._lock:
+            await self._ensure_table()
+            async with self._aconn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(f"SELECT value FROM {self._table} WHERE key = %s", (str(key),))
+                result = await cur.fetchone()
+        if result is None:
+            return None
+        return StoreModel.model_validate(result["value"])
 
     async def set(self, key: Stringable, value: T | None) -> None:
-        await self._ensure_table()
+        await self.set_many({key: value})
+
+    async def set_many(self, items: Mapping[Stringable, T | None]) -> None:
+        async with self._lock:
+            await self._ensure_table()
+            try:
+                await self._write(items)
+            except BaseException:
+                await self._aconn.rollback()
+                raise
+
+    async def _write(self, items: Mapping[Stringable, T | None]) -> None:
         async with self._aconn.cursor() as cur:
-            if value is None:
-                await cur.execute(
-                    f"DELETE FROM {self._table} WHERE key = %s",
-                    (str(key),),
-                )
-            else:
-                await cur.execute(
-                    f"""
-                    INSERT INTO {self._table} (key, value)
-                    VALUES (%s, %s)
-                    ON CONFLICT (key)
-                    DO UPDATE SET value = EXCLUDED.value
-                    """,
-                    (str(key), value.model_dump_json()),
-                )
-            await cur.execute(f"NOTIFY {self._channel}, '{key!s}'")  # NOTIFY appears not to accept params
+            # All items are written in a single transaction, the lock keeps other calls out of it
+            for key, value in items.items():
+                if value is None:
+                    await cur.execute(
+                        f"DELETE FROM {self._table} WHERE key = %s",
+                        (str(key),),
+                    )
+                else:
+                    await cur.execute(
+                        f"""
+                        INSERT INTO {self._table} (key, value)
+                        VALUES (%s, %s)
+                        ON CONFLICT (key)
+                        DO UPDATE SET value = EXCLUDED.value
+                        """,
+                        (str(key), value.model_dump_json()),
+                    )
+                await cur.execute(f"NOTIFY {self._channel}, '{key!s}'")  # NOTIFY appears not to accept params
             await self._aconn.commit()
 
     async def watch(self, key: Stringable, *, ready: asyncio.Event | None = None) -> AsyncIterator[T | None]:
@@ -58,6 +74,18 @@ class PostgreSQLStore(Store[T], Generic[T]):
                 if notify.payload == str(key):
                     yield await self.get(key)
 
+    async def watch_prefix(self, prefix: Stringable = "", *, ready: asyncio.Event | None = None) -> AsyncIterator[str]:
+        notify_conn = await AsyncConnection.connect(
+            conninfo=f"{self._aconn.info.dsn} password={self._aconn.info.password}", autocommit=True
+        )
+        async with notify_conn:
+            await notify_conn.execute(f"LISTEN {self._channel}")
+            if ready:
+                ready.set()
+            async for notify in notify_conn.notifies():
+                if notify.payload.startswith(str(prefix)):
+                    yield notify.payload
+
     async def _ensure_table(self) -> None:
         async with self._aconn.cursor() as cur:
             await cur.execute(f"""
@@ -1,5 +1,5 @@
 import asyncio
-from collections.abc import AsyncIterator
+from collections.abc import AsyncIterator, Mapping
 from typing import Generic
 
 from redis.asyncio import Redis
@@ -23,6 +23,15 @@ class RedisStore(Store[T], Generic[T]):
         else:
             await self._redis.set(name=str(key), value=value.model_dump_json())
 
+    async def set_many(self, items: Mapping[Stringable, T | None]) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                if value is None:
+                    pipe.delete(str(key))
+                else:
+                    pipe.set(name=str(key), value=value.model_dump_json())
+            await pipe.execute()
+
     async def watch(self, key: Stringable, *, ready: asyncio.Event | None = None) -> AsyncIterator[T]:
         await self._redis.config_set("notify-keyspace-events", "KEA")
 
@@ -38,3 +47,21 @@ class RedisStore(Store[T], Generic[T]):
         finally:
             await pubsub.unsubscribe(channel)
             await pubsub.close()
+
+    async def watch_prefix(self, prefix: Stringable = "", *, ready: asyncio.Event | None = None) -> AsyncIterator[str]:
+        await self._redis.config_set("notify-keyspace-events", "KEA")
+
+        pubsub = self._redis.pubsub()
+        channel_prefix = "__keyspace@0__:"
+        pattern = f"{channel_prefix}{prefix!s}*"
+        await pubsub.psubscribe(pattern)
+        if ready:
+            ready.set()
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "pmessage":
+                    channel = message["channel"]
+                    yield (channel.decode() if isinstance(channel, bytes) else channel).removeprefix(channel_prefix)
+        finally:
+            await pubsub.punsubscribe(pattern)
+            await pubsub.close()
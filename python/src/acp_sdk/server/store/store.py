@@ -1,6 +1,6 @@
 import asyncio
 from abc import ABC, abstractmethod
-from collections.abc import AsyncIterator
+from collections.abc import AsyncIterator, Mapping
 from typing import Generic, TypeVar
 
 from pydantic import BaseModel, ConfigDict
@@ -25,10 +25,25 @@ class Store(Generic[T], ABC):
     async def set(self, key: Stringable, value: T | None) -> None:
         pass
 
+    async def set_many(self, items: Mapping[Stringable, T | None]) -> None:
+        """Sets all items, stores able to write them in one round trip override this"""
+        await asyncio.gather(*(self.set(key, value) for key, value in items.items()))
+
     @abstractmethod
     def watch(self, key: Stringable, *, ready: asyncio.Event | None = None) -> AsyncIterator[T | None]:
         pass
 
+    def watch_prefix(self, prefix: Stringable = "", *, ready: asyncio.Event | None = None) -> AsyncIterator[str]:
+        """Watches all keys starting with the prefix, yielding keys of changed values
+
+        Optional, `Dispatcher` falls back to watching each subscribed key with `watch` for stores without it.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support watching a prefix")
+
+    @property
+    def can_watch_prefix(self) -> bool:
+        return type(self).watch_prefix is not Store.watch_prefix
+
     def as_store(self, model: type[U], prefix: Stringable = "") -> "Store[U]":
         return StoreView(model=model, store=self, prefix=prefix)
 
@@ -47,9 +62,20 @@ class StoreView(Store[U], Generic[U]):
     async def set(self, key: Stringable, value: U | None) -> None:
         await self._store.set(self._get_key(key), value)
 
+    async def set_many(self, items: Mapping[Stringable, U | None]) -> None:
+        await self._store.set_many({self._get_key(key): value for key, value in items.items()})
+
     async def watch(self, key: Stringable, *, ready: asyncio.Event | None = None) -> AsyncIterator[U | None]:
         async for value in self._store.watch(self._get_key(key), ready=ready):
             yield self._model.model_validate(value.model_dump()) if value else value
 
+    async def watch_prefix(self, prefix: Stringable = "", *, ready: asyncio.Event | None = None) -> AsyncIterator[str]:
+        async for key in self._store.watch_prefix(self._get_key(prefix), ready=ready):
+            yield key.removeprefix(str(self._prefix))
+
+    @property
+    def can_watch_prefix(self) -> bool:
+        return self._store.can_watch_prefix
+
     def _get_key(self, key: Stringable) -> str:
         return f"{self._prefix!s}{key!s}"
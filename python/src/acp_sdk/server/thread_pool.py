@@ -0,0 +1,59 @@
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, ParamSpec, TypeVar
+
+from pydantic import BaseModel
+
+from acp_sdk.instrumentation import get_meter
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+meter = get_meter()
+wait_time_histogram = meter.create_histogram(
+    "acp.thread_pool.wait_time", unit="s", description="Time tasks spend queued before a worker picks them up"
+)
+active_counter = meter.create_up_down_counter(
+    "acp.thread_pool.active", description="Number of workers currently running a task"
+)
+queued_counter = meter.create_up_down_counter(
+    "acp.thread_pool.queued", description="Number of tasks waiting for a free worker"
+)
+
+
+class ThreadPoolConfig(BaseModel):
+    max_workers: int | None = None
+    thread_name_prefix: str | None = None
+
+
+class InstrumentedThreadPoolExecutor(ThreadPoolExecutor):
+    """Thread pool reporting utilization and queue wait time of its tasks"""
+
+    def __init__(self, *, name: str, config: ThreadPoolConfig | None = None) -> None:
+        config = config or ThreadPoolConfig()
+        super().__init__(
+            max_workers=config.max_workers,
+            thread_name_prefix=config.thread_name_prefix or f"acp-{name}",
+        )
+        self.name = name
+        self._attributes = {"acp.thread_pool": name, "acp.thread_pool.max_workers": self._max_workers}
+
+    def submit(self, fn: Callable[P, R], /, *args: P.args, **kwargs: P.kwargs) -> Future[R]:
+        submitted_at = time.perf_counter()
+        queued_counter.add(1, self._attributes)
+
+        def run() -> Any:
+            queued_counter.add(-1, self._attributes)
+            wait_time_histogram.record(time.perf_counter() - submitted_at, self._attributes)
+            active_counter.add(1, self._attributes)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                active_counter.add(-1, self._attributes)
+
+        try:
+            return super().submit(run)
+        except BaseException:
+            queued_counter.add(-1, self._attributes)
+            raise
@@ -1,46 +1,244 @@
 import asyncio
-from collections.abc import AsyncGenerator, Coroutine
+import json
+from collections.abc import AsyncGenerator, AsyncIterator, Coroutine, Iterable, MutableMapping, Sequence
+from datetime import timedelta
 from typing import Any, Callable
 
 import httpx
 import requests
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
-from acp_sdk.models import RunStatus
+from acp_sdk.models import Event, EventExpander, EventMode, RunBatchEvent, RunStatus
+from acp_sdk.server.dispatcher import Dispatcher
 from acp_sdk.server.executor import RunData
 from acp_sdk.server.logging import logger
 from acp_sdk.server.store import Store
 
+event_adapter = TypeAdapter(Event)
 
-def encode_sse(model: BaseModel) -> str:
-    return f"data: {model.model_dump_json()}\n\n"
+
+def encode_sse(model: BaseModel, *, id: int | str | None = None) -> str:
+    data = f"data: {model.model_dump_json()}\n\n"
+    return data if id is None else f"id: {id}\n{data}"
 
 
 async def watch_util_stop(
-    run_data: RunData, store: Store[RunData], *, ready: asyncio.Event | None = None
+    run_data: RunData, dispatcher: Dispatcher[RunData], *, ready: asyncio.Event | None = None
 ) -> AsyncGenerator[RunData]:
-    async for data in run_data.watch(store, ready=ready):
+    async for data in run_data.watch(dispatcher, ready=ready):
         yield data
         if data.run.status == RunStatus.AWAITING:
             break
 
 
-async def wait_util_stop(run_data: RunData, store: Store[RunData], *, ready: asyncio.Event | None = None) -> RunData:
+async def wait_util_stop(
+    run_data: RunData, dispatcher: Dispatcher[RunData], *, ready: asyncio.Event | None = None
+) -> RunData:
     data = run_data
-    async for latest_data in watch_util_stop(run_data, store, ready=ready):
+    async for latest_data in watch_util_stop(run_data, dispatcher, ready=ready):
         data = latest_data
     return data
 
 
-async def stream_sse(
-    run_data: RunData, store: Store[RunData], idx: int, *, ready: asyncio.Event | None = None
+def create_expander(events: Iterable[Event], mode: EventMode) -> EventExpander | None:
+    """Expander primed with the events preceding a stream, None when the stored compact events are sent as they are"""
+    if mode == EventMode.COMPACT:
+        return None
+    expander = EventExpander()
+    for event in events:
+        expander.expand(event)
+    return expander
+
+
+def validate_event(event: Event | Any) -> Event:
+    return event if isinstance(event, BaseModel) else event_adapter.validate_python(event)
+
+
+async def encode_events_page(
+    events: Sequence[Event | Any],
+    *,
+    after: int | None = None,
+    limit: int | None = None,
+    types: set[str] | None = None,
+    mode: EventMode = EventMode.FULL,
+    expanders: MutableMapping[int, EventExpander] | None = None,
 ) -> AsyncGenerator[str]:
+    """Encodes a page of the events as `RunEventsListResponse` one event at a time
+
+    Events may be left unvalidated, only those on the page are. Expanders left at the end of a page are kept in
+    `expanders` by its last event id, so that the next page does not replay the events before it.
+    """
+    start = 0 if after is None else after + 1
+    expander = expanders.pop(after, None) if expanders is not None and after is not None else None
+    if expander is None:
+        expander = create_expander(map(validate_event, events[:start]), mode)
+    last_event_id = after
+    count = 0
+    yield '{"events":['
+    for id, event in enumerate(events[start:], start=start):
+        if limit is not None and count >= limit:
+            break
+        last_event_id = id
+        event = validate_event(event)
+        event = expander.expand(event) if expander else event
+        if types and event.type not in types:
+            continue
+        yield f"{',' if count else ''}{event.model_dump_json()}"
+        count += 1
+    if expander and expanders is not None and last_event_id is not None:
+        expanders[last_event_id] = expander
+    has_more = (-1 if last_event_id is None else last_event_id) + 1 < len(events)
+    yield f'],"last_event_id":{json.dumps(last_event_id)},"has_more":{json.dumps(has_more)}}}'
+
+
+async def replay_util_stop(run_data: RunData, store: Store[RunData], dispatcher: Dispatcher[RunData]) -> RunData:
+    """Same as `wait_util_stop` for runs executed elsewhere that may have stopped already"""
+    queue: asyncio.Queue[RunData | None] = asyncio.Queue()
+    unsubscribe = dispatcher.subscribe(run_data.key, queue.put_nowait)
+    try:
+        # Read after subscribing so that no change falls in between
+        data = await store.get(run_data.key) or run_data
+        while not data.run.status.is_terminal and data.run.status != RunStatus.AWAITING:
+            data = await queue.get()
+            if data is None:
+                raise RuntimeError("Missing data")
+        return data
+    finally:
+        unsubscribe()
+
+
+async def stream_events(
+    run_data: RunData,
+    dispatcher: Dispatcher[RunData],
+    idx: int,
+    *,
+    ready: asyncio.Event | None = None,
+    mode: EventMode = EventMode.FULL,
+) -> AsyncGenerator[tuple[int, Event]]:
+    expander = create_expander(run_data.events[:idx], mode)
     next_event_idx = idx
-    async for data in watch_util_stop(run_data, store, ready=ready):
+    async for data in watch_util_stop(run_data, dispatcher, ready=ready):
         new_events = data.events[next_event_idx:]
-        next_event_idx = len(data.events)
-        for event in new_events:
-            yield encode_sse(event)
+        for id, event in enumerate(new_events, start=next_event_idx):
+            yield id, expander.expand(event) if expander else event
+        next_event_idx += len(new_events)
+
+
+async def stream_sse(
+    run_data: RunData,
+    dispatcher: Dispatcher[RunData],
+    idx: int,
+    *,
+    ready: asyncio.Event | None = None,
+    mode: EventMode = EventMode.FULL,
+) -> AsyncGenerator[str]:
+    async for id, event in stream_events(run_data, dispatcher, idx, ready=ready, mode=mode):
+        yield encode_sse(event, id=id)
+
+
+async def stream_batch_sse(
+    prepared: list[tuple[RunData, asyncio.Event]],
+    dispatcher: Dispatcher[RunData],
+    *,
+    mode: EventMode = EventMode.FULL,
+) -> AsyncGenerator[str]:
+    """Streams events of all the runs as they come, each tagged by the id of its run"""
+    queue: asyncio.Queue[str | None] = asyncio.Queue()
+
+    async def forward(run_data: RunData, ready: asyncio.Event) -> None:
+        try:
+            async for id, event in stream_events(run_data, dispatcher, 0, ready=ready, mode=mode):
+                # One Last-Event-ID cannot cover several runs, so the batch is not resumable as a whole. Ids name
+                # the run and the event index instead, a dropped client resumes each run on /runs/{run_id}/stream.
+                batch_event = RunBatchEvent(run_id=run_data.run.run_id, event=event)
+                queue.put_nowait(encode_sse(batch_event, id=f"{run_data.run.run_id}/{id}"))
+        finally:
+            queue.put_nowait(None)
+
+    tasks = [asyncio.create_task(forward(run_data, ready)) for run_data, ready in prepared]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            chunk = await queue.get()
+            if chunk is None:
+                remaining -= 1
+                continue
+            yield chunk
+        # Surfaces failures of the forwarding tasks
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def replay_sse(
+    run_data: RunData,
+    store: Store[RunData],
+    dispatcher: Dispatcher[RunData],
+    idx: int,
+    *,
+    mode: EventMode = EventMode.FULL,
+) -> AsyncGenerator[str]:
+    """Streams events starting at the index, replaying the stored ones before following the run"""
+    queue: asyncio.Queue[RunData | None] = asyncio.Queue()
+    unsubscribe = dispatcher.subscribe(run_data.key, queue.put_nowait)
+    try:
+        # Read after subscribing so that no change falls in between
+        data = await store.get(run_data.key) or run_data
+        expander = create_expander(data.events[:idx], mode)
+        while True:
+            for id, event in enumerate(data.events[idx:], start=idx):
+                yield encode_sse(expander.expand(event) if expander else event, id=id)
+            idx = max(idx, len(data.events))
+            if data.run.status.is_terminal or data.run.status == RunStatus.AWAITING:
+                break
+            data = await queue.get()
+            if data is None:
+                raise RuntimeError("Missing data")
+    finally:
+        unsubscribe()
+
+
+async def frame_sse(
+    stream: AsyncIterator[str], *, keep_alive: timedelta | None = None, batch_window: timedelta | None = None
+) -> AsyncGenerator[str]:
+    """Writes events arriving within the batch window together and fills quiet periods with keep-alive comments"""
+    loop = asyncio.get_running_loop()
+    pending: asyncio.Future[str] | None = None
+
+    async def next_chunk(timeout: float | None) -> str | None:
+        # Returns None on timeout, the pending read is kept for the next call
+        nonlocal pending
+        if pending is None:
+            pending = asyncio.ensure_future(stream.__anext__())
+        done, _ = await asyncio.wait({pending}, timeout=timeout)
+        if not done:
+            return None
+        chunk, pending = pending, None
+        return chunk.result()
+
+    try:
+        while True:
+            chunk = await next_chunk(keep_alive.total_seconds() if keep_alive else None)
+            if chunk is None:
+                yield ": keep-alive\n\n"
+                continue
+            if batch_window:
+                deadline = loop.time() + batch_window.total_seconds()
+                try:
+                    while (remaining := deadline - loop.time()) > 0 and (more := await next_chunk(remaining)):
+                        chunk += more
+                except StopAsyncIteration:
+                    yield chunk
+                    return
+            yield chunk
+    except StopAsyncIteration:
+        pass
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
 
 
 async def async_request_with_retry(
@@ -1,2 +1,3 @@
+from acp_sdk.shared.cache import ResourceCache as ResourceCache
 from acp_sdk.shared.resources import ResourceLoader as ResourceLoader
 from acp_sdk.shared.resources import ResourceStore as ResourceStore
@@ -0,0 +1,71 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+from acp_sdk.instrumentation import get_meter
+
+meter = get_meter()
+hits_counter = meter.create_counter("acp.resource_cache.hits", description="Number of loads served from the cache")
+misses_counter = meter.create_counter(
+    "acp.resource_cache.misses", description="Number of loads that had to fetch the resource"
+)
+coalesced_counter = meter.create_counter(
+    "acp.resource_cache.coalesced", description="Number of loads that joined an in-flight fetch of the same resource"
+)
+size_counter = meter.create_up_down_counter(
+    "acp.resource_cache.size", unit="By", description="Total size of the cached resources"
+)
+
+
+class ResourceCache:
+    """Byte-bounded LRU cache where concurrent loads of the same key share a single fetch"""
+
+    def __init__(self, *, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self._max_bytes = max_bytes
+        self._size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task[bytes]] = {}
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    async def get_or_load(self, key: str, load: Callable[[], Awaitable[bytes]]) -> bytes:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            hits_counter.add(1)
+            return self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            coalesced_counter.add(1)
+        else:
+            misses_counter.add(1)
+            task = asyncio.ensure_future(load())
+            self._inflight[key] = task
+            task.add_done_callback(lambda task: self._on_loaded(key, task))
+        # A cancelled waiter must not cancel the fetch shared with other waiters
+        return await asyncio.shield(task)
+
+    def invalidate(self, key: str) -> None:
+        data = self._entries.pop(key, None)
+        if data is not None:
+            self._resize(-len(data))
+
+    def _on_loaded(self, key: str, task: asyncio.Task[bytes]) -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        data = task.result()
+        if len(data) > self._max_bytes:
+            return
+        self.invalidate(key)
+        self._entries[key] = data
+        self._resize(len(data))
+        while self._size > self._max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._resize(-len(evicted))
+
+    def _resize(self, delta: int) -> None:
+        self._size += delta
+        size_counter.add(delta)
@@ -1,40 +1,108 @@
+import hashlib
+import uuid
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
 from datetime import timedelta
 
-import cachetools
-import cachetools.func
 import httpx
 import obstore
+from obstore.exceptions import NotFoundError
 from obstore.store import AzureStore, GCSStore, HTTPStore, ObjectStore, S3Store
 
 from acp_sdk.models.types import ResourceId, ResourceUrl
+from acp_sdk.shared.cache import ResourceCache
 
 
 class ResourceLoader:
-    def __init__(self, *, client: httpx.AsyncClient | None = None) -> None:
+    def __init__(self, *, client: httpx.AsyncClient | None = None, cache: ResourceCache | None = None) -> None:
         self._client = client or httpx.AsyncClient(follow_redirects=False)
+        self._cache = cache or ResourceCache()
 
-    @cachetools.func.lfu_cache
     async def load(self, url: ResourceUrl) -> bytes:
+        return await self._cache.get_or_load(str(url), lambda: self._fetch(url))
+
+    async def load_range(self, url: ResourceUrl, range: tuple[int, int]) -> bytes:
+        """Loads only the bytes in the half-open range of the resource"""
+        start, end = range
+        if start >= end:
+            return b""
+        return await self._cache.get_or_load(f"{url}#{start}-{end}", lambda: self._fetch_range(url, range))
+
+    async def load_stream(self, url: ResourceUrl) -> AsyncIterator[bytes]:
+        """Streams the resource in chunks, bypassing the cache"""
+        async with self._client.stream("GET", str(url)) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                yield chunk
+
+    async def _fetch(self, url: ResourceUrl) -> bytes:
         response = await self._client.get(str(url))
         response.raise_for_status()
         return await response.aread()
 
+    async def _fetch_range(self, url: ResourceUrl, range: tuple[int, int]) -> bytes:
+        start, end = range
+        response = await self._client.get(str(url), headers={"Range": f"bytes={start}-{end - 1}"})
+        response.raise_for_status()
+        data = await response.aread()
+        # Servers without range support send the whole resource
+        return data if response.status_code == 206 else data[start:end]
+
 
 class ResourceStore:
-    def __init__(self, *, store: ObjectStore, presigned_url_expiration: timedelta = timedelta(days=7)) -> None:
+    def __init__(
+        self,
+        *,
+        store: ObjectStore,
+        presigned_url_expiration: timedelta = timedelta(days=7),
+        content_addressed: bool = False,
+    ) -> None:
         self._store = store
         self._presigned_url_expiration = presigned_url_expiration
+        self._content_addressed = content_addressed
 
-    async def load(self, id: ResourceId):  # noqa: ANN201
-        result = await self._store.get_async(str(id))
+    async def load(self, id: ResourceId, *, range: tuple[int, int] | None = None):  # noqa: ANN201
+        """Loads the resource, optionally only the bytes in the half-open range"""
+        result = await self._store.get_async(str(id), options={"range": range} if range else None)
         return result
 
+    async def head(self, id: ResourceId):  # noqa: ANN201
+        return await self._store.head_async(str(id))
+
+    async def load_stream(self, id: ResourceId, *, chunk_size: int = 5 * 1024 * 1024) -> AsyncIterator[bytes]:
+        result = await self._store.get_async(str(id))
+        async for chunk in result.stream(min_chunk_size=chunk_size):
+            yield bytes(chunk)
+
     async def store(
         self,
         id: ResourceId,
-        data: bytes,
+        data: bytes | Iterable[bytes] | AsyncIterable[bytes],
+        *,
+        content_type: str | None = None,
     ) -> None:
-        await self._store.put_async(str(id), data)
+        """Stores the data, iterables are uploaded in parts without buffering them whole"""
+        await self._store.put_async(str(id), data, attributes={"Content-Type": content_type} if content_type else None)
+
+    async def store_content(self, data: bytes) -> ResourceId:
+        """Stores the data under a new id, content addressed stores reuse the id of identical data"""
+        if not self._content_addressed:
+            id = uuid.uuid4()
+            await self.store(id, data)
+            return id
+
+        id = uuid.UUID(bytes=hashlib.sha256(data).digest()[:16])
+        try:
+            await self._store.head_async(str(id))
+        except (NotFoundError, FileNotFoundError):
+            await self.store(id, data)
+        return id
+
+    async def delete(self, id: ResourceId) -> None:
+        await self._store.delete_async(str(id))
+
+    @property
+    def content_addressed(self) -> bool:
+        return self._content_addressed
 
     async def url(self, id: ResourceId) -> ResourceUrl:
         if isinstance(self._store, (AzureStore, GCSStore, S3Store)):
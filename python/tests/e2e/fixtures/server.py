@@ -1,6 +1,7 @@
 import asyncio
 import base64
 import os
+import threading
 import time
 from collections.abc import AsyncGenerator, AsyncIterator, Generator
 from datetime import timedelta
@@ -12,7 +13,7 @@ import pytest_postgresql.factories
 import pytest_redis.factories
 from acp_sdk.models import Artifact, AwaitResume, Error, ErrorCode, Message, MessageAwaitRequest, MessagePart
 from acp_sdk.models.errors import ACPError
-from acp_sdk.server import Context, Server
+from acp_sdk.server import Context, Server, ThreadPoolConfig
 from acp_sdk.server.store import MemoryStore, PostgreSQLStore, RedisStore, Store
 from psycopg import AsyncConnection
 from pytest_postgresql.executor import PostgreSQLExecutor
@@ -150,6 +151,22 @@ def server(request: pytest.FixtureRequest, store: Store) -> Generator[None]:
             content_encoding="base64",
         )
 
+    @server.agent(thread_pool=ThreadPoolConfig(max_workers=1, thread_name_prefix="isolated"))
+    def isolated(input: list[Message], context: Context) -> MessagePart:
+        return MessagePart(content=threading.current_thread().name)
+
+    @server.agent(timeout=timedelta(milliseconds=500))
+    async def timeouter(input: list[Message], context: Context) -> AsyncIterator[Message]:
+        await asyncio.sleep(10)
+        yield MessagePart(content="Unreachable")
+
+    @server.agent(await_timeout=timedelta(milliseconds=500))
+    async def impatient_awaiter(
+        input: list[Message], context: Context
+    ) -> AsyncGenerator[Message | MessageAwaitRequest, AwaitResume]:
+        yield MessageAwaitRequest(message=Message(parts=[]))
+        yield MessagePart(content="Unreachable")
+
     thread = Thread(
         target=server.run, kwargs={"self_registration": False, "store": store, "port": Config.PORT}, daemon=True
     )
@@ -1,16 +1,23 @@
 import asyncio
 import base64
+from datetime import timedelta
 
 import pytest
 from acp_sdk.client import Client
 from acp_sdk.models import (
+    ACPError,
     AgentName,
     ArtifactEvent,
     ErrorCode,
+    Event,
+    EventExpander,
+    EventMode,
     Message,
     MessageAwaitResume,
     MessagePart,
     MessagePartEvent,
+    RunAwaitingEvent,
+    RunBatchEvent,
     RunCancelledEvent,
     RunCompletedEvent,
     RunCreatedEvent,
@@ -18,6 +25,9 @@ from acp_sdk.models import (
     RunStatus,
 )
 from acp_sdk.server import Server
+from httpx_sse import aconnect_sse
+from websockets.asyncio.client import connect
+from websockets.exceptions import InvalidStatus
 
 input = [Message(parts=[MessagePart(content="Hello!")])]
 output = [message.model_copy(update={"role": "agent/echo"}) for message in input]
@@ -61,6 +71,55 @@ async def test_run_events(server: Server, client: Client) -> None:
     assert isinstance(events[-1], RunCompletedEvent)
 
 
+@pytest.mark.asyncio
+async def test_run_wait(server: Server, client: Client) -> None:
+    run = await client.run_async(agent="slow_echo", input=input)
+    statuses = []
+    while not run.status.is_terminal:
+        run = await client.run_wait(run_id=run.run_id, since_status=run.status)
+        statuses.append(run.status)
+    assert statuses[-1] == RunStatus.COMPLETED
+    assert len(statuses) == len(set(statuses))
+
+    run = await client.run_sync(agent="awaiter", input=input)
+    assert run.status == RunStatus.AWAITING
+    run = await client.run_wait(run_id=run.run_id, wait=timedelta(milliseconds=200))
+    assert run.status == RunStatus.AWAITING
+
+    # Terminal runs are returned right away even when the client has already seen their status
+    run = await client.run_sync(agent="echo", input=input)
+    run = await asyncio.wait_for(
+        client.run_wait(run_id=run.run_id, since_status=RunStatus.COMPLETED, wait=timedelta(seconds=10)), timeout=2
+    )
+    assert run.status == RunStatus.COMPLETED
+
+
+@pytest.mark.asyncio
+async def test_run_wait_cancelling(server: Server, client: Client) -> None:
+    run = await client.run_async(agent="slow_echo", input=input * 3)
+    run = await client.run_cancel(run_id=run.run_id)
+    assert run.status == RunStatus.CANCELLING
+    # Updates stored while the cancel is pending are not mistaken for a change back to in-progress
+    while not run.status.is_terminal:
+        run = await client.run_wait(run_id=run.run_id, since_status=run.status)
+        assert run.status != RunStatus.IN_PROGRESS
+    assert run.status == RunStatus.CANCELLED
+
+
+@pytest.mark.asyncio
+async def test_run_events_pages(server: Server, client: Client) -> None:
+    run = await client.run_sync(agent="echo", input=input)
+    events = [event async for event in client.run_events(run_id=run.run_id)]
+    paged = [event async for event in client.run_events(run_id=run.run_id, page_size=2)]
+    assert paged == events
+
+    after = [event async for event in client.run_events(run_id=run.run_id, after=1)]
+    assert after == events[2:]
+
+    parts = [event async for event in client.run_events(run_id=run.run_id, types=["message.part"], page_size=1)]
+    assert parts == [event for event in events if event.type == "message.part"]
+
+
 @pytest.mark.asyncio
 async def test_run_events_are_stream(server: Server, client: Client) -> None:
     stream = [event async for event in client.run_stream(agent="echo", input=input)]
@@ -223,3 +282,163 @@ async def test_artifact_streaming(server: Server, client: Client) -> None:
     assert "text/plain" in artifact_types
     assert "application/json" in artifact_types
     assert "image/png" in artifact_types
+
+
+@pytest.mark.asyncio
+async def test_dedicated_thread_pool(server: Server, client: Client) -> None:
+    run = await client.run_sync(agent="isolated", input=input)
+    assert run.status == RunStatus.COMPLETED
+    assert str(run.output[0]).startswith("isolated")
+
+
+@pytest.mark.asyncio
+async def test_run_timeout(server: Server, client: Client) -> None:
+    run = await client.run_sync(agent="timeouter", input=input)
+    assert run.status == RunStatus.FAILED
+    assert run.error is not None
+    assert "timeout" in run.error.message
+
+
+@pytest.mark.asyncio
+async def test_run_await_timeout(server: Server, client: Client) -> None:
+    run = await client.run_sync(agent="impatient_awaiter", input=input)
+    assert run.status == RunStatus.AWAITING
+    await asyncio.sleep(1)
+    run = await client.run_status(run_id=run.run_id)
+    assert run.status == RunStatus.FAILED
+    assert run.error is not None
+
+
+@pytest.mark.asyncio
+async def test_run_events_stream_resume(server: Server, client: Client) -> None:
+    run = await client.run_async(agent="slow_echo", input=input)
+    events = [event async for event in client.run_events_stream(run_id=run.run_id)]
+    assert isinstance(events[0], RunCreatedEvent)
+    assert isinstance(events[-1], RunCompletedEvent)
+
+    resumed = [event async for event in client.run_events_stream(run_id=run.run_id, last_event_id=1)]
+    assert resumed == events[2:]
+
+
+@pytest.mark.asyncio
+async def test_websocket(server: Server, client: Client) -> None:
+    async with client.websocket() as socket:
+
+        async def collect(agent: AgentName) -> list[Event]:
+            return [event async for event in socket.run_stream(agent=agent, input=input)]
+
+        echoed, awaited = await asyncio.gather(collect("slow_echo"), collect("awaiter"))
+        assert isinstance(echoed[-1], RunCompletedEvent)
+        assert echoed[-1].run.output == [message.model_copy(update={"role": "agent/slow_echo"}) for message in input]
+        assert isinstance(awaited[-1], RunAwaitingEvent)
+
+        run_id = awaited[-1].run.run_id
+        resumed = [event async for event in socket.run_resume_stream(run_id=run_id, await_resume=await_resume)]
+        assert isinstance(resumed[0], RunInProgressEvent)
+        assert isinstance(resumed[-1], RunCompletedEvent)
+
+        with pytest.raises(ACPError):
+            await socket.run_cancel(run_id=run_id)
+
+
+@pytest.mark.asyncio
+async def test_websocket_origin(server: Server, client: Client) -> None:
+    url = str(client.client.base_url.copy_with(scheme="ws").join("/ws"))
+    with pytest.raises(InvalidStatus):
+        async with connect(url, origin="https://attacker.example"):
+            pass
+    async with connect(url, origin="https://agentcommunicationprotocol.dev"):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_run_stream_compact(server: Server, client: Client) -> None:
+    full = [event async for event in client.run_stream(agent="echo", input=input)]
+    async with Client(base_url=client.client.base_url, event_mode=EventMode.COMPACT) as compact_client:
+        compact = [event async for event in compact_client.run_stream(agent="echo", input=input)]
+        listed = [event async for event in compact_client.run_events(run_id=compact[-1].run.run_id)]
+
+    assert isinstance(compact[-1], RunCompletedEvent)
+    assert compact[-1].run.output == []
+    assert listed == compact
+
+    expander = EventExpander()
+    expanded = [expander.expand(event) for event in compact]
+    assert expanded[-1].run.output == full[-1].run.output == output
+
+
+@pytest.mark.asyncio
+async def test_run_batch(server: Server, client: Client) -> None:
+    runs = await client.run_batch([("echo", input), ("slow_echo", input)])
+    assert [run.status for run in runs] == [RunStatus.COMPLETED, RunStatus.COMPLETED]
+    assert runs[0].output == output
+
+    runs = await client.run_batch_async([("echo", input), ("echo", input)])
+    assert len({run.run_id for run in runs}) == 2
+
+    events: dict[str, list[Event]] = {}
+    async for run_id, event in client.run_batch_stream([("echo", input), ("slow_echo", input)]):
+        events.setdefault(str(run_id), []).append(event)
+    assert len(events) == 2
+    for stream in events.values():
+        assert isinstance(stream[0], RunCreatedEvent)
+        assert isinstance(stream[-1], RunCompletedEvent)
+
+    with pytest.raises(ACPError):
+        await client.run_batch([("echo", input), ("missing", input)])
+
+    with pytest.raises(ACPError) as e:
+        await client.run_batch([("echo", input)] * 101)
+    assert e.value.error.code == ErrorCode.INVALID_INPUT
+
+
+@pytest.mark.asyncio
+async def test_run_batch_stream_ids(server: Server, client: Client) -> None:
+    body = {
+        "runs": [{"agent_name": "echo", "input": [message.model_dump(mode="json") for message in input]}],
+        "mode": "stream",
+    }
+    async with aconnect_sse(client.client, "POST", "/runs/batch", json=body) as event_source:
+        sses = [sse async for sse in event_source.aiter_sse()]
+    run_id = RunBatchEvent.model_validate_json(sses[0].data).run_id
+    # Ids carry the index of the event in its run, the run is resumed from there on its own stream
+    assert [sse.id for sse in sses] == [f"{run_id}/{idx}" for idx in range(len(sses))]
+    resumed = [event async for event in client.run_events_stream(run_id=run_id, last_event_id=1)]
+    assert resumed == [RunBatchEvent.model_validate_json(sse.data).event for sse in sses[2:]]
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key(server: Server, client: Client) -> None:
+    run = await client.run_sync(agent="echo", input=input, idempotency_key="sync")
+    retried = await client.run_sync(agent="echo", input=input, idempotency_key="sync")
+    assert retried.run_id == run.run_id
+    assert retried.output == output
+
+    events = [event async for event in client.run_stream(agent="slow_echo", input=input, idempotency_key="stream")]
+    retried = [event async for event in client.run_stream(agent="slow_echo", input=input, idempotency_key="stream")]
+    assert retried == events
+
+    other = await client.run_sync(agent="echo", input=input, idempotency_key="other")
+    assert other.run_id != run.run_id
+
+    with pytest.raises(ACPError) as e:
+        await client.run_sync(agent="slow_echo", input=input, idempotency_key="sync")
+    assert e.value.error.code == ErrorCode.INVALID_INPUT
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_raw_body(server: Server, client: Client) -> None:
+    body = '{"agent_name": "echo", "input": [{"parts": [{"content": "Hello!"}]}], "mode": "sync"}'
+    headers = {"Idempotency-Key": "raw", "Content-Type": "application/json"}
+    first = await client.client.post("/runs", content=body, headers=headers)
+    retried = await client.client.post("/runs", content=body, headers=headers)
+    assert first.status_code == retried.status_code == 200
+    assert first.headers["Run-ID"] == retried.headers["Run-ID"]
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_failed_create(server: Server, client: Client) -> None:
+    for _ in range(2):
+        with pytest.raises(ACPError) as e:
+            await client.run_sync(agent="missing", input=input, idempotency_key="failed")
+        assert e.value.error.code == ErrorCode.NOT_FOUND
@@ -28,7 +28,7 @@ async def test_session_refresh(server: Server, client: Client) -> None:
         await session.run_async(agent=agent, input=input)
         await asyncio.sleep(2)
         sess = await session.refresh_session()
-        assert len(sess.history) == len(input) * 2
+        assert sum(len(segment) for segment in sess.segments) == len(input) * 2
 
 
 @pytest.mark.asyncio
@@ -1,7 +1,14 @@
+import asyncio
 import json
+import ssl
+from collections.abc import AsyncIterator
+from typing import Any
 
+import acp_sdk.client.client
 import pytest
 from acp_sdk.client import Client
+from acp_sdk.client.client import accept_encoding
+from acp_sdk.client.socket import RunSocket
 from acp_sdk.models import (
     ACPError,
     Agent,
@@ -16,6 +23,7 @@ from acp_sdk.models import (
     RunCompletedEvent,
     RunEventsListResponse,
     Session,
+    SocketError,
 )
 from pytest_httpx import HTTPXMock
 
@@ -236,3 +244,64 @@ async def test_create_url() -> None:
         assert str(client._create_url("/agents", base_url="http://foo/bar")) == "http://foo/bar/agents"
         assert str(client._create_url("/agents", base_url="http://foo/bar/")) == "http://foo/bar/agents"
         assert str(client._create_url("/agents", base_url="/foo")) == "/foo/agents"
+
+
+@pytest.mark.asyncio
+async def test_websocket_handshake(monkeypatch: pytest.MonkeyPatch) -> None:
+    handshake = {}
+
+    def connect(url: str, **kwargs: Any) -> None:
+        handshake.update(url=url, **kwargs)
+        raise ConnectionRefusedError
+
+    monkeypatch.setattr(acp_sdk.client.client, "connect", connect)
+    async with Client(
+        base_url="https://test",
+        auth=("user", "pass"),
+        headers={"X-Tenant": "acme"},
+        cookies={"session": "abc"},
+        params={"tenant": "acme"},
+        verify=False,
+    ) as client:
+        with pytest.raises(ConnectionRefusedError):
+            async with client.websocket():
+                pass
+
+    assert handshake["url"] == "wss://test/ws?tenant=acme"
+    headers = dict(handshake["additional_headers"])
+    assert headers["x-tenant"] == "acme"
+    assert headers["cookie"] == "session=abc"
+    assert headers["authorization"].startswith("Basic ")
+    assert "accept-encoding" not in headers
+    assert handshake["ssl"].verify_mode == ssl.CERT_NONE
+
+
+@pytest.mark.asyncio
+async def test_websocket_unattributed_error() -> None:
+    class Connection:
+        def __init__(self) -> None:
+            self.responses: asyncio.Queue[str] = asyncio.Queue()
+
+        async def send(self, message: str) -> None:
+            error = Error(code=ErrorCode.INVALID_INPUT, message="Invalid request")
+            await self.responses.put(SocketError(error=error).model_dump_json())
+
+        async def __aiter__(self) -> AsyncIterator[str]:
+            while True:
+                yield await self.responses.get()
+
+    async with RunSocket(Connection()) as socket:
+        # Errors without a ref fail the pending requests instead of leaving them waiting
+        with pytest.raises(ACPError):
+            await asyncio.wait_for(socket.run_cancel(run_id=mock_run.run_id), timeout=1)
+
+
+def test_accept_encoding(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert accept_encoding(False) == "identity"
+    assert accept_encoding(True).endswith("gzip")
+
+    monkeypatch.setattr(acp_sdk.client.client, "SUPPORTED_DECODERS", {"identity": None, "gzip": None, "br": None})
+    assert accept_encoding(True) == "br, gzip"
+
+    monkeypatch.setattr(acp_sdk.client.client, "SUPPORTED_DECODERS", {"identity": None, "gzip": None})
+    assert accept_encoding(True) == "gzip"
@@ -1,8 +1,27 @@
 import asyncio
+import uuid
 
+import obstore
 import pytest
 from acp_sdk.models.errors import ACPError, Error, ErrorCode
-from acp_sdk.models.models import Message, MessagePart, Run, RunStatus
+from acp_sdk.models.models import (
+    EventExpander,
+    HistorySegment,
+    Message,
+    MessageCompletedEvent,
+    MessageCreatedEvent,
+    MessagePart,
+    MessagePartEvent,
+    Run,
+    RunAwaitingEvent,
+    RunCompletedEvent,
+    RunStatus,
+    Session,
+    StatePatch,
+    compact_event,
+)
+from acp_sdk.models.types import ResourceUrl
+from acp_sdk.shared import ResourceLoader, ResourceStore
 
 timestamp = "2021-09-09T22:02:47.89Z"
 
@@ -136,3 +155,124 @@ def test_run_raise_on_status_raise(run: Run, error: type[Exception] | None) -> N
             run.raise_for_status()
     else:
         run.raise_for_status()
+
+
+def test_history_segment_roundtrip() -> None:
+    messages = [
+        Message(parts=[MessagePart(content="Foo")], created_at=timestamp, completed_at=timestamp),
+        Message(parts=[MessagePart(content="Bar\nBaz")], created_at=timestamp, completed_at=timestamp),
+    ]
+    data, offsets = HistorySegment.encode(messages)
+    segment = HistorySegment(url="http://localhost/segment", offsets=offsets)
+    assert len(segment) == 2
+    assert segment.decode(data) == messages
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("last_n,expected", [(None, 5), (0, 0), (1, 1), (2, 2), (3, 3), (4, 4), (10, 5)])
+async def test_session_load_history(last_n: int | None, expected: int) -> None:
+    messages = [
+        Message(parts=[MessagePart(content=str(i))], created_at=timestamp, completed_at=timestamp) for i in range(5)
+    ]
+    resources = {"http://localhost/legacy": messages[0].model_dump_json().encode()}
+    data, offsets = HistorySegment.encode(messages[1:3])
+    resources["http://localhost/first"] = data
+    first = HistorySegment(url="http://localhost/first", offsets=offsets)
+    data, offsets = HistorySegment.encode(messages[3:])
+    resources["http://localhost/second"] = data
+    second = HistorySegment(url="http://localhost/second", offsets=offsets)
+
+    class Loader:
+        async def load(self, url: ResourceUrl) -> bytes:
+            await asyncio.sleep(0)
+            return resources[str(url)]
+
+        async def load_range(self, url: ResourceUrl, range: tuple[int, int]) -> bytes:
+            start, end = range
+            return resources[str(url)][start:end]
+
+    session = Session(history=["http://localhost/legacy"], segments=[first, second])
+    history = [message async for message in session.load_history(loader=Loader(), last_n=last_n, concurrency=2)]
+    assert history == messages[len(messages) - expected :]
+
+
+@pytest.mark.parametrize(
+    "old,new",
+    [
+        (b"Hello world", b"Hello world!"),
+        (b"Hello world", b"Hello there world"),
+        (b"Hello world", b"Hello"),
+        (b"aaaa", b"aaaaaa"),
+        (b"", b"new"),
+        (b"old", b""),
+    ],
+)
+def test_state_patch(old: bytes, new: bytes) -> None:
+    patch = StatePatch.diff(old, new)
+    assert patch is not None
+    assert len(patch.data) <= len(new)
+    assert StatePatch.decode(patch.encode()).apply(old) == new
+
+
+@pytest.mark.asyncio
+async def test_session_update_state() -> None:
+    class Store(ResourceStore):
+        async def url(self, id: uuid.UUID) -> ResourceUrl:
+            return ResourceUrl(url=f"http://localhost/{id}")
+
+    class Loader(ResourceLoader):
+        fetches = 0
+
+        async def _fetch(self, url: ResourceUrl) -> bytes:
+            self.fetches += 1
+            result = await store.load(uuid.UUID(url.path.removeprefix("/")))
+            return bytes(await result.bytes_async())
+
+    store = Store(store=obstore.store.MemoryStore())
+    loader = Loader()
+    session = Session(store=store, loader=loader)
+    state = b"x" * 100
+    await session.update_state(state, compact_after=2)
+    assert session.state is not None and session.state_patches == []
+
+    for i in range(3):
+        state += str(i).encode()
+        await session.update_state(state, compact_after=2)
+        assert await session.load_state() == state
+    assert len(session.state_patches) == 0
+
+    await session.update_state(b"y" * 100, compact_after=2)
+    assert session.state_patches == []
+    assert await session.load_state() == b"y" * 100
+    # The previous state is held locally, nothing has to be downloaded
+    assert loader.fetches == 0
+
+    # A session read back from the store assembles the state from storage once
+    restored = Session.model_validate_json(session.model_dump_json())
+    restored.store, restored.loader = store, loader
+    await restored.update_state(b"y" * 99 + b"z", compact_after=2)
+    assert loader.fetches == 1
+    assert await restored.load_state() == b"y" * 99 + b"z"
+    assert loader.fetches == 1
+
+
+def test_event_expander() -> None:
+    first = Message(role="agent/echo", parts=[MessagePart(content="Foo")], completed_at=timestamp)
+    second = Message(role="agent/echo", parts=[MessagePart(content="Bar")], completed_at=None)
+    run = Run(agent_name="echo")
+    events = [
+        MessageCreatedEvent(message=first.model_copy(update={"parts": []})),
+        MessagePartEvent(part=first.parts[0]),
+        MessageCompletedEvent(message=first),
+        MessageCreatedEvent(message=second.model_copy(update={"parts": []})),
+        MessagePartEvent(part=second.parts[0]),
+        RunAwaitingEvent(run=run.model_copy(update={"output": [first, second]})),
+        MessageCompletedEvent(message=second),
+        RunCompletedEvent(run=run.model_copy(update={"output": [first, second]})),
+    ]
+
+    compacted = [compact_event(event) for event in events]
+    assert all(not event.run.output for event in compacted if isinstance(event, RunAwaitingEvent | RunCompletedEvent))
+
+    expander = EventExpander()
+    assert [expander.expand(event) for event in compacted] == events
@@ -0,0 +1,101 @@
+import zlib
+from collections.abc import AsyncIterator
+
+import brotli
+import httpx
+import pytest
+import zstandard
+from acp_sdk.server.compression import COMPRESSORS, CompressionMiddleware, negotiate_encoding
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+decompressors = {
+    "gzip": lambda: zlib.decompressobj(wbits=zlib.MAX_WBITS | 16).decompress,
+    "br": lambda: brotli.Decompressor().process,
+    "zstd": lambda: zstandard.ZstdDecompressor().decompressobj().decompress,
+}
+
+
+@pytest.mark.parametrize(
+    "accept_encoding,expected",
+    [
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("gzip, br, zstd", "zstd"),
+        ("gzip;q=1.0, br;q=0.5", "gzip"),
+        ("*", "zstd"),
+        ("*, zstd;q=0", "br"),
+        ("deflate", None),
+    ],
+)
+def test_negotiate_encoding(accept_encoding: str, expected: str | None) -> None:
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+@pytest.mark.parametrize("encoding", list(COMPRESSORS))
+def test_compressor_flushes(encoding: str) -> None:
+    compressor = COMPRESSORS[encoding]()
+    decompress = decompressors[encoding]()
+    for chunk in [b"data: first\n\n", b"data: second\n\n"]:
+        # Every chunk is decodable on arrival, without waiting for the end of the stream
+        assert decompress(compressor.compress(chunk, final=False)) == chunk
+    assert decompress(compressor.compress(b"", final=True)) == b""
+
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/small")
+    async def small() -> PlainTextResponse:
+        return PlainTextResponse("small")
+
+    @app.get("/large")
+    async def large() -> PlainTextResponse:
+        return PlainTextResponse("large" * 100)
+
+    @app.get("/etag")
+    async def etag() -> PlainTextResponse:
+        return PlainTextResponse("large" * 100, headers={"ETag": '"abc"'})
+
+    @app.get("/stream")
+    async def stream() -> StreamingResponse:
+        async def events() -> AsyncIterator[str]:
+            for i in range(3):
+                yield f"data: {i}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding", list(COMPRESSORS))
+async def test_middleware(encoding: str) -> None:
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"Accept-Encoding": encoding}
+
+        response = await client.get("/small", headers=headers)
+        assert "content-encoding" not in response.headers
+        assert response.text == "small"
+
+        response = await client.get("/large", headers=headers)
+        assert response.headers["content-encoding"] == encoding
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert int(response.headers["content-length"]) < 500
+        assert response.text == "large" * 100
+
+        response = await client.get("/etag", headers=headers)
+        assert response.headers["etag"] == 'W/"abc"'
+        response = await client.get("/etag", headers={"Accept-Encoding": "identity"})
+        assert response.headers["etag"] == '"abc"'
+
+        response = await client.get("/stream", headers=headers)
+        assert response.headers["content-encoding"] == encoding
+        assert response.text == "".join(f"data: {i}\n\n" for i in range(3))
+
+        response = await client.get("/large", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
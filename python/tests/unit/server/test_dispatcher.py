@@ -0,0 +1,114 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from acp_sdk.server.dispatcher import Dispatcher
+from acp_sdk.server.store import MemoryStore, Store
+from acp_sdk.server.store.utils import Stringable
+from pydantic import BaseModel
+
+
+class Signal(BaseModel):
+    value: int
+
+
+@pytest.mark.asyncio
+async def test_dispatch_to_subscriber() -> None:
+    store = MemoryStore(limit=10, ttl=timedelta(minutes=1)).as_store(model=Signal, prefix="signal_")
+    received: dict[str, list[Signal | None]] = {"a": [], "b": []}
+
+    async with Dispatcher(store) as dispatcher:
+        await asyncio.wait_for(dispatcher.ready.wait(), timeout=1)
+        dispatcher.subscribe("a", received["a"].append)
+        unsubscribe = dispatcher.subscribe("b", received["b"].append)
+
+        await store.set("a", Signal(value=1))
+        unsubscribe()
+        await store.set("b", Signal(value=2))
+        await asyncio.sleep(0.1)
+
+    assert received["a"] == [Signal(value=1)]
+    assert received["b"] == []
+
+
+@pytest.mark.asyncio
+async def test_catch_up_on_connect() -> None:
+    store = MemoryStore(limit=10, ttl=timedelta(minutes=1)).as_store(model=Signal, prefix="signal_")
+    await store.set("a", Signal(value=1))
+    received: list[Signal | None] = []
+
+    dispatcher = Dispatcher(store)
+    dispatcher.subscribe("a", received.append)
+    async with dispatcher:
+        await asyncio.sleep(0.1)
+
+    assert received == [Signal(value=1)]
+
+
+@pytest.mark.asyncio
+async def test_watch() -> None:
+    store = MemoryStore(limit=10, ttl=timedelta(minutes=1)).as_store(model=Signal, prefix="signal_")
+
+    async with Dispatcher(store) as dispatcher:
+        ready = asyncio.Event()
+        watch = dispatcher.watch("a", ready=ready)
+        first = asyncio.create_task(watch.__anext__())
+        await ready.wait()
+        await store.set("a", Signal(value=1))
+        assert await asyncio.wait_for(first, timeout=1) == Signal(value=1)
+        await watch.aclose()
+
+
+@pytest.mark.asyncio
+async def test_fetches_concurrently() -> None:
+    unblock = asyncio.Event()
+
+    class SlowStore(MemoryStore):
+        async def get(self, key: Stringable) -> BaseModel | None:
+            if str(key) == "signal_a":
+                await unblock.wait()
+            return await super().get(key)
+
+    store = SlowStore(limit=10, ttl=timedelta(minutes=1)).as_store(model=Signal, prefix="signal_")
+    received: list[str] = []
+
+    async with Dispatcher(store) as dispatcher:
+        await asyncio.wait_for(dispatcher.ready.wait(), timeout=1)
+        dispatcher.subscribe("a", lambda _: received.append("a"))
+        dispatcher.subscribe("b", lambda _: received.append("b"))
+        await store.set("a", Signal(value=1))
+        await store.set("b", Signal(value=2))
+        await asyncio.sleep(0.1)
+        # A slow read of one key does not hold back the others
+        assert received == ["b"]
+        unblock.set()
+        await asyncio.sleep(0.1)
+
+    assert received == ["b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_store_without_watch_prefix() -> None:
+    class KeyStore(MemoryStore):
+        watch_prefix = Store.watch_prefix
+
+    store = KeyStore(limit=10, ttl=timedelta(minutes=1)).as_store(model=Signal, prefix="signal_")
+    assert not store.can_watch_prefix
+    await store.set("b", Signal(value=0))
+    received: dict[str, list[Signal | None]] = {"a": [], "b": []}
+
+    async with Dispatcher(store) as dispatcher:
+        assert dispatcher.ready.is_set()
+        dispatcher.subscribe("a", received["a"].append)
+        unsubscribe = dispatcher.subscribe("b", received["b"].append)
+        await asyncio.sleep(0.1)
+
+        await store.set("a", Signal(value=1))
+        await asyncio.sleep(0.1)
+        unsubscribe()
+        await store.set("b", Signal(value=2))
+        await asyncio.sleep(0.1)
+
+    # Keys are watched one by one, the memory store repeats values whenever any key changes
+    assert received["a"] and all(value == Signal(value=1) for value in received["a"])
+    assert received["b"] and all(value == Signal(value=0) for value in received["b"])
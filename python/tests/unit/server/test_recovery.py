@@ -0,0 +1,147 @@
+import asyncio
+from collections.abc import AsyncGenerator, Mapping
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from acp_sdk.models import Message, MessageAwaitRequest, MessageAwaitResume, Run, RunStatus
+from acp_sdk.server import Context, RecoveryPolicy, agent
+from acp_sdk.server.app import create_app
+from acp_sdk.server.executor import RunData
+from acp_sdk.server.recovery import Lease, LeaseKeeper
+from acp_sdk.server.store import MemoryStore
+from acp_sdk.server.store.utils import Stringable
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+
+@pytest.mark.asyncio
+async def test_lease_is_exclusive() -> None:
+    store = MemoryStore(limit=10, ttl=timedelta(minutes=1)).as_store(model=Lease, prefix="lease_")
+    first = LeaseKeeper(store, worker_id="first")
+    second = LeaseKeeper(store, worker_id="second")
+
+    assert await first.acquire("run")
+    assert not await second.acquire("run")
+
+    await first.release("run")
+    assert await second.acquire("run")
+
+
+@pytest.mark.asyncio
+async def test_abandoned_after_expiry() -> None:
+    store = MemoryStore(limit=10, ttl=timedelta(minutes=1)).as_store(model=Lease, prefix="lease_")
+    ttl = timedelta(milliseconds=100)
+    worker = LeaseKeeper(store, worker_id="worker", ttl=ttl)
+    peer = LeaseKeeper(store, worker_id="peer", ttl=ttl)
+    now = datetime.now(timezone.utc)
+
+    assert not await peer.is_abandoned("run", since=now)
+    assert await peer.is_abandoned("run", since=now - 2 * ttl)
+
+    await worker.acquire("run")
+    assert not await peer.is_abandoned("run", since=now)
+    await asyncio.sleep(2 * ttl.total_seconds())
+    assert await peer.is_abandoned("run", since=now)
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_renews_lease() -> None:
+    store = MemoryStore(limit=10, ttl=timedelta(minutes=1)).as_store(model=Lease, prefix="lease_")
+    ttl = timedelta(milliseconds=150)
+    peer = LeaseKeeper(store, worker_id="peer", ttl=ttl)
+
+    async with LeaseKeeper(store, worker_id="worker", ttl=ttl) as worker:
+        await worker.acquire("run")
+        await asyncio.sleep(3 * ttl.total_seconds())
+        assert not await peer.is_abandoned("run", since=datetime.now(timezone.utc) - 2 * ttl)
+
+
+@pytest.mark.asyncio
+async def test_claim_leases() -> None:
+    store = MemoryStore(limit=10, ttl=timedelta(minutes=1)).as_store(model=Lease, prefix="lease_")
+    worker = LeaseKeeper(store, worker_id="worker")
+    peer = LeaseKeeper(store, worker_id="peer")
+
+    await worker.claim(["first", "second"])
+    for key in ["first", "second"]:
+        assert (await store.get(key)).worker_id == "worker"
+        assert not await peer.acquire(key)
+
+
+def test_restart_keeps_request_limits() -> None:
+    headers: list[dict[str, str]] = []
+
+    @agent(recovery_policy=RecoveryPolicy.RESTART)
+    async def slow(input: list[Message], context: Context) -> AsyncGenerator[Message]:
+        headers.append(dict(context.request.headers))
+        await asyncio.sleep(5)
+        yield Message(parts=[])
+
+    store = MemoryStore(limit=10, ttl=timedelta(minutes=1))
+    created_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+    run = Run(agent_name="slow", status=RunStatus.IN_PROGRESS, created_at=created_at)
+    # Abandoned by its worker, created with a timeout that has a moment left
+    run_data = RunData(
+        run=run,
+        input=[Message(parts=[])],
+        deadline=datetime.now(timezone.utc) + timedelta(milliseconds=200),
+    )
+
+    asyncio.run(store.as_store(model=RunData, prefix="run_").set(run_data.key, run_data))
+
+    with TestClient(create_app(slow, store=store)) as client:
+        response = client.get(f"/runs/{run.run_id}", headers={"Authorization": "Bearer reader"})
+        assert response.json()["status"] == "created"
+
+        while response.json()["status"] != "failed":
+            status = response.json()["status"]
+            response = client.get(f"/runs/{run.run_id}", params={"wait": 1, "since_status": status})
+            assert response.json()["status"] in ("created", "in-progress", "failed")
+        assert "timeout" in response.json()["error"]["message"]
+
+    # The run restarted outside of the request that recovered it
+    assert len(headers) == 1
+    assert "authorization" not in headers[0]
+
+
+def test_resume_after_recovery() -> None:
+    @agent()
+    async def awaiter(input: list[Message]) -> AsyncGenerator[MessageAwaitRequest]:
+        yield MessageAwaitRequest(message=Message(parts=[]))
+
+    store = MemoryStore(limit=10, ttl=timedelta(minutes=1))
+    created_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+    await_request = MessageAwaitRequest(message=Message(parts=[]))
+    run = Run(agent_name="awaiter", status=RunStatus.AWAITING, await_request=await_request, created_at=created_at)
+    asyncio.run(store.as_store(model=RunData, prefix="run_").set(str(run.run_id), RunData(run=run)))
+
+    with TestClient(create_app(awaiter, store=store)) as client:
+        # The worker awaiting the resume is gone, the run is failed as soon as it is read
+        response = client.post(
+            f"/runs/{run.run_id}",
+            json={
+                "await_resume": MessageAwaitResume(message=Message(parts=[])).model_dump(mode="json"),
+                "mode": "async",
+            },
+        )
+        assert response.status_code == 403
+        assert client.get(f"/runs/{run.run_id}").json()["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_renews_in_one_write() -> None:
+    writes: list[list[str]] = []
+
+    class CountingStore(MemoryStore):
+        async def set_many(self, items: Mapping[Stringable, BaseModel | None]) -> None:
+            writes.append(sorted(str(key) for key in items))
+            await super().set_many(items)
+
+    store = CountingStore(limit=10, ttl=timedelta(minutes=1)).as_store(model=Lease, prefix="lease_")
+    async with LeaseKeeper(store, worker_id="worker", ttl=timedelta(milliseconds=150)) as worker:
+        await worker.claim(["first", "second"])
+        claimed = (await store.get("first")).expires_at
+        await asyncio.sleep(0.1)
+
+    assert writes[-1] == ["lease_first", "lease_second"]
+    assert (await store.get("first")).expires_at > claimed
@@ -0,0 +1,171 @@
+import uuid
+from collections.abc import AsyncIterator, Iterator
+
+import obstore
+import pytest
+from acp_sdk.models import ResourceUrl
+from acp_sdk.server.app import create_app
+from acp_sdk.server.resources import LocalResourceLoader
+from acp_sdk.shared import ResourceStore
+from fastapi.testclient import TestClient
+from pytest_httpx import HTTPXMock
+
+
+@pytest.mark.asyncio
+async def test_local_resources_skip_http(httpx_mock: HTTPXMock) -> None:
+    store = ResourceStore(store=obstore.store.MemoryStore())
+    loader = LocalResourceLoader(store=store)
+    id = uuid.uuid4()
+    url = ResourceUrl(url=f"http://localhost:8000/resources/{id}")
+    loader.register(id, url)
+    await store.store(id, b"local")
+
+    assert await loader.load(url) == b"local"
+    assert not httpx_mock.get_requests()
+
+
+@pytest.mark.asyncio
+async def test_missing_local_resource_falls_back_to_http(httpx_mock: HTTPXMock) -> None:
+    store = ResourceStore(store=obstore.store.MemoryStore())
+    loader = LocalResourceLoader(store=store)
+    id = uuid.uuid4()
+    other = uuid.uuid4()
+    loader.register(other, ResourceUrl(url=f"http://localhost:8000/resources/{other}"))
+    url = ResourceUrl(url=f"http://localhost:8000/resources/{id}")
+    httpx_mock.add_response(url=str(url), content=b"remote")
+
+    assert await loader.load(url) == b"remote"
+
+
+@pytest.mark.asyncio
+async def test_stream_local_resource(httpx_mock: HTTPXMock) -> None:
+    store = ResourceStore(store=obstore.store.MemoryStore())
+    loader = LocalResourceLoader(store=store)
+    id = uuid.uuid4()
+    url = ResourceUrl(url=f"http://localhost:8000/resources/{id}")
+    loader.register(id, url)
+
+    async def chunks() -> AsyncIterator[bytes]:
+        for _ in range(3):
+            yield b"x" * 1024
+
+    await store.store(id, chunks())
+
+    assert b"".join([chunk async for chunk in store.load_stream(id, chunk_size=1024)]) == b"x" * 3072
+    assert b"".join([chunk async for chunk in loader.load_stream(url)]) == b"x" * 3072
+    assert not httpx_mock.get_requests()
+
+
+@pytest.mark.asyncio
+async def test_load_range(httpx_mock: HTTPXMock) -> None:
+    store = ResourceStore(store=obstore.store.MemoryStore())
+    loader = LocalResourceLoader(store=store)
+    id = uuid.uuid4()
+    url = ResourceUrl(url=f"http://localhost:8000/resources/{id}")
+    loader.register(id, url)
+    await store.store(id, b"0123456789")
+    assert await loader.load_range(url, (2, 5)) == b"234"
+
+    remote = ResourceUrl(url="http://remote/resource")
+    httpx_mock.add_response(url=str(remote), match_headers={"Range": "bytes=5-9"}, status_code=206, content=b"56789")
+    assert await loader.load_range(remote, (5, 10)) == b"56789"
+    # Servers ignoring the range send the whole resource
+    other = ResourceUrl(url="http://remote/other")
+    httpx_mock.add_response(url=str(other), content=b"0123456789")
+    assert await loader.load_range(other, (5, 10)) == b"56789"
+
+
+@pytest.fixture
+def resource_client() -> Iterator[tuple[TestClient, uuid.UUID]]:
+    store = ResourceStore(store=obstore.store.MemoryStore())
+    id = uuid.uuid4()
+
+    with TestClient(create_app(resource_store=store)) as client:
+        client.portal.call(store.store, id, b"0123456789")
+        yield client, id
+
+
+@pytest.mark.parametrize(
+    "range,status_code,content,content_range",
+    [
+        ("bytes=2-4", 206, b"234", "bytes 2-4/10"),
+        ("bytes=7-", 206, b"789", "bytes 7-9/10"),
+        ("bytes=-3", 206, b"789", "bytes 7-9/10"),
+        ("bytes=5-100", 206, b"56789", "bytes 5-9/10"),
+        ("bytes=0-1,4-5", 200, b"0123456789", None),
+        ("bytes=4-2", 200, b"0123456789", None),
+        ("bytes=10-", 416, None, "bytes */10"),
+    ],
+)
+def test_range_request(
+    resource_client: tuple[TestClient, uuid.UUID],
+    range: str,
+    status_code: int,
+    content: bytes | None,
+    content_range: str | None,
+) -> None:
+    client, id = resource_client
+    response = client.get(f"/resources/{id}", headers={"Range": range})
+    assert response.status_code == status_code
+    assert response.headers.get("Content-Range") == content_range
+    if content is not None:
+        assert response.content == content
+    else:
+        assert response.json()["code"] == "invalid_input"
+
+
+def test_conditional_request(resource_client: tuple[TestClient, uuid.UUID]) -> None:
+    client, id = resource_client
+    response = client.get(f"/resources/{id}")
+    assert response.status_code == 200
+    assert response.headers["Content-Length"] == "10"
+
+    response = client.get(f"/resources/{id}", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    response = client.get(f"/resources/{id}", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+    response = client.get(f"/resources/{id}", headers={"If-Modified-Since": response.headers["Last-Modified"]})
+    assert response.status_code == 304
+
+
+def test_content_type(resource_client: tuple[TestClient, uuid.UUID]) -> None:
+    client, id = resource_client
+    assert client.get(f"/resources/{id}").headers["Content-Type"] == "application/octet-stream"
+
+    store = ResourceStore(store=obstore.store.MemoryStore())
+    with TestClient(create_app(resource_store=store)) as client:
+        client.portal.call(lambda: store.store(id, b"text", content_type="text/plain"))
+        assert client.get(f"/resources/{id}").headers["Content-Type"].startswith("text/plain")
+        response = client.get(f"/resources/{id}", headers={"Range": "bytes=0-1"})
+        assert response.headers["Content-Type"].startswith("text/plain")
+
+
+def test_quoted_etag() -> None:
+    class QuotingStore(ResourceStore):
+        async def head(self, id: uuid.UUID):  # noqa: ANN202
+            # As S3, GCS and Azure return it
+            return {**await super().head(id), "e_tag": '"abc"'}
+
+    store = QuotingStore(store=obstore.store.MemoryStore())
+    id = uuid.uuid4()
+    with TestClient(create_app(resource_store=store)) as client:
+        client.portal.call(store.store, id, b"data")
+        response = client.get(f"/resources/{id}")
+        assert response.headers["ETag"] == '"abc"'
+        assert client.get(f"/resources/{id}", headers={"If-None-Match": '"abc"'}).status_code == 304
+
+
+def test_missing_resource(resource_client: tuple[TestClient, uuid.UUID]) -> None:
+    client, _ = resource_client
+    assert client.get(f"/resources/{uuid.uuid4()}").status_code == 404
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("content_addressed", [True, False])
+async def test_store_content(content_addressed: bool) -> None:
+    store = ResourceStore(store=obstore.store.MemoryStore(), content_addressed=content_addressed)
+    first = await store.store_content(b"data")
+    second = await store.store_content(b"data")
+    assert (first == second) == content_addressed
+    assert await store.store_content(b"other") != first
+    assert b"".join([chunk async for chunk in store.load_stream(second)]) == b"data"
@@ -1,10 +1,16 @@
 import asyncio
+import time
+import uuid
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 
 import pytest
-from acp_sdk.server import Server
-from fastapi import FastAPI
+from acp_sdk.models import Message, MessagePart, Session
+from acp_sdk.server import Server, agent
+from acp_sdk.server.app import create_app
+from fastapi import Depends, FastAPI, WebSocketDisconnect, status
+from fastapi.security import HTTPBearer
+from fastapi.testclient import TestClient
 
 
 @pytest.mark.asyncio
@@ -29,3 +35,110 @@ async def test_lifespan() -> None:
 
     assert entry
     assert exit
+
+
+def read_history(client: TestClient, session_id: str) -> list[str]:
+    session = Session.model_validate(client.get(f"/sessions/{session_id}").json())
+    history = []
+    for segment in session.segments:
+        history.extend(segment.decode(client.get(str(segment.url)).content))
+    return [message.parts[0].content for message in history]
+
+
+def run_sync(client: TestClient, session_id: str, content: str) -> None:
+    response = client.post(
+        "/runs", json={"agent_name": "echo", "session_id": session_id, "input": [{"parts": [{"content": content}]}]}
+    )
+    assert response.json()["status"] == "completed"
+
+
+def test_deferred_session_recording_keeps_concurrent_runs() -> None:
+    @agent()
+    async def echo(input: list[Message]) -> AsyncGenerator[Message]:
+        await asyncio.sleep(0.1)
+        for message in input:
+            yield message
+
+    session_id = str(uuid.uuid4())
+    with TestClient(create_app(echo, defer_session_recording=True)) as client:
+        run_sync(client, session_id, "zero")
+        # Both runs start from the same session and record it concurrently
+        response = client.post(
+            "/runs/batch",
+            json={
+                "runs": [
+                    {"agent_name": "echo", "session_id": session_id, "input": [{"parts": [{"content": text}]}]}
+                    for text in ["first", "second"]
+                ],
+                "mode": "async",
+            },
+        )
+        assert response.status_code == 202
+        for run in response.json()["runs"]:
+            response = client.get(f"/runs/{run['run_id']}", params={"wait": 5, "since_status": "in-progress"})
+            assert response.json()["status"] == "completed"
+
+        for _ in range(50):
+            history = read_history(client, session_id)
+            if len(history) == 6:
+                break
+            time.sleep(0.1)
+        assert history[:2] == ["zero", "zero"]
+        assert sorted(history[2:]) == ["first", "first", "second", "second"]
+
+
+def test_session_segments_compaction() -> None:
+    @agent()
+    async def echo(input: list[Message]) -> AsyncGenerator[Message]:
+        for message in input:
+            yield message
+
+    session_id = str(uuid.uuid4())
+    with TestClient(create_app(echo, session_segment_size=1000)) as client:
+        run_sync(client, session_id, "0")
+        [first] = Session.model_validate(client.get(f"/sessions/{session_id}").json()).segments
+        for i in range(1, 20):
+            run_sync(client, session_id, str(i))
+
+        session = Session.model_validate(client.get(f"/sessions/{session_id}").json())
+        assert len(session.segments) < 20
+        assert all(segment.offsets[-1] <= 1000 for segment in session.segments)
+        assert read_history(client, session_id) == [str(i) for i in range(20) for _ in range(2)]
+        # Segments merged by the compaction are removed from the store
+        assert client.get(str(first.url)).status_code == 404
+
+
+def test_coalesce_parts() -> None:
+    @agent()
+    async def tokens(input: list[Message]) -> AsyncGenerator[MessagePart]:
+        for token in ["Hello", ", ", "world", "!"]:
+            yield MessagePart(content=token)
+
+    with TestClient(create_app(tokens, coalesce_parts=True)) as client:
+        run = client.post("/runs", json={"agent_name": "tokens", "input": [{"parts": [{"content": "Hi"}]}]}).json()
+        assert [part["content"] for part in run["output"][0]["parts"]] == ["Hello, world!"]
+
+        events = client.get(f"/runs/{run['run_id']}/events").json()["events"]
+        # Streaming clients still receive every token as it was produced
+        parts = [event["part"]["content"] for event in events if event["type"] == "message.part"]
+        assert parts == ["Hello", ", ", "world", "!"]
+
+
+def test_websocket_dependencies() -> None:
+    @agent()
+    async def echo(input: list[Message]) -> AsyncGenerator[Message]:
+        for message in input:
+            yield message
+
+    with TestClient(create_app(echo, dependencies=[Depends(HTTPBearer())])) as client:
+        # The app dependencies apply to the handshake even though they expect a plain request
+        with pytest.raises(WebSocketDisconnect) as e, client.websocket_connect("/ws"):
+            pass
+        assert e.value.code == status.WS_1008_POLICY_VIOLATION
+
+        with client.websocket_connect("/ws", headers={"Authorization": "Bearer token"}) as websocket:
+            request = {"agent_name": "echo", "input": [{"parts": [{"content": "Hello"}]}]}
+            websocket.send_json({"type": "run.create", "ref": "run", "request": request})
+            while (response := websocket.receive_json())["type"] != "done":
+                assert response["ref"] == "run"
+            assert response["run"]["status"] == "completed"
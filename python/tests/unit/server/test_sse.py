@@ -0,0 +1,108 @@
+import asyncio
+from collections.abc import AsyncIterator
+from datetime import timedelta
+
+import pytest
+from acp_sdk.models import (
+    EventExpander,
+    EventMode,
+    Message,
+    MessageCompletedEvent,
+    MessageCreatedEvent,
+    MessagePart,
+    MessagePartEvent,
+    RunCompletedEvent,
+    RunEventsListResponse,
+    RunInProgressEvent,
+)
+from acp_sdk.models import Run as RunModel
+from acp_sdk.server.utils import encode_events_page, frame_sse
+
+
+async def source(*chunks: tuple[float, str]) -> AsyncIterator[str]:
+    for delay, chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_keep_alive() -> None:
+    stream = frame_sse(source((0.25, "data: a\n\n")), keep_alive=timedelta(milliseconds=100))
+    chunks = [chunk async for chunk in stream]
+    assert chunks == [": keep-alive\n\n", ": keep-alive\n\n", "data: a\n\n"]
+
+
+@pytest.mark.asyncio
+async def test_batching() -> None:
+    stream = frame_sse(
+        source((0, "data: a\n\n"), (0, "data: b\n\n"), (0.2, "data: c\n\n")),
+        batch_window=timedelta(milliseconds=50),
+    )
+    chunks = [chunk async for chunk in stream]
+    assert chunks == ["data: a\n\ndata: b\n\n", "data: c\n\n"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "after,limit,types,expected,last_event_id,has_more",
+    [
+        (None, None, None, [0, 1, 2], 2, False),
+        (None, 2, None, [0, 1], 1, True),
+        (0, 1, None, [1], 1, True),
+        (None, 1, {"run.completed"}, [2], 2, False),
+        (None, 1, {"run.in-progress"}, [0], 0, True),
+        (None, None, {"run.completed"}, [2], 2, False),
+        (2, None, None, [], 2, False),
+    ],
+)
+async def test_encode_events_page(
+    after: int | None,
+    limit: int | None,
+    types: set[str] | None,
+    expected: list[int],
+    last_event_id: int | None,
+    has_more: bool,
+) -> None:
+    run = RunModel(agent_name="echo")
+    events = [
+        RunInProgressEvent(run=run),
+        MessageCreatedEvent(message=Message(parts=[])),
+        RunCompletedEvent(run=run),
+    ]
+    chunks = [
+        chunk
+        async for chunk in encode_events_page(events, after=after, limit=limit, types=types, mode=EventMode.COMPACT)
+    ]
+    page = RunEventsListResponse.model_validate_json("".join(chunks))
+    assert page.events == [events[i] for i in expected]
+    assert page.last_event_id == last_event_id
+    assert page.has_more == has_more
+
+
+@pytest.mark.asyncio
+async def test_encode_events_pages_reuse_expander() -> None:
+    run = RunModel(agent_name="echo")
+    message = Message(parts=[MessagePart(content="Hello")])
+    events = [
+        RunInProgressEvent(run=run),
+        MessageCreatedEvent(message=message.model_copy(update={"parts": []})),
+        MessagePartEvent(part=message.parts[0]),
+        MessageCompletedEvent(message=message),
+        RunCompletedEvent(run=run),
+    ]
+
+    async def read_page(
+        events: list[dict | None], after: int | None, expanders: dict[int, EventExpander]
+    ) -> RunEventsListResponse:
+        chunks = [chunk async for chunk in encode_events_page(events, after=after, limit=2, expanders=expanders)]
+        return RunEventsListResponse.model_validate_json("".join(chunks))
+
+    expanders: dict[int, EventExpander] = {}
+    first = await read_page([event.model_dump() for event in events], None, expanders)
+    assert first.last_event_id == 1 and list(expanders) == [1]
+
+    # Events before the cursor are not replayed, they would fail validation
+    second = await read_page([None, None, *(event.model_dump() for event in events[2:])], 1, expanders)
+    third = await read_page([None] * 4 + [events[4].model_dump()], second.last_event_id, expanders)
+    assert list(expanders) == [4]
+    assert third.events[0].run.output == [message]
@@ -0,0 +1,56 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+import pytest
+from acp_sdk.shared import ResourceCache
+
+
+@pytest.mark.asyncio
+async def test_single_flight() -> None:
+    cache = ResourceCache()
+    calls = 0
+
+    async def load() -> bytes:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"data"
+
+    results = await asyncio.gather(*(cache.get_or_load("key", load) for _ in range(5)))
+    assert results == [b"data"] * 5
+    assert await cache.get_or_load("key", load) == b"data"
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used() -> None:
+    cache = ResourceCache(max_bytes=8)
+
+    def load(data: bytes) -> Callable[[], Awaitable[bytes]]:
+        async def _load() -> bytes:
+            return data
+
+        return _load
+
+    await cache.get_or_load("a", load(b"aaaa"))
+    await cache.get_or_load("b", load(b"bbbb"))
+    await cache.get_or_load("a", load(b"xxxx"))
+    await cache.get_or_load("c", load(b"cccc"))
+    assert cache.size == 8
+    assert await cache.get_or_load("a", load(b"xxxx")) == b"aaaa"
+    assert await cache.get_or_load("b", load(b"yyyy")) == b"yyyy"
+
+
+@pytest.mark.asyncio
+async def test_failed_load_is_not_cached() -> None:
+    cache = ResourceCache()
+
+    async def fail() -> bytes:
+        raise RuntimeError("Failed")
+
+    async def load() -> bytes:
+        return b"data"
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_load("key", fail)
+    assert await cache.get_or_load("key", load) == b"data"